@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Monthly Averages of USD/IDR and MOPS under Alternative Averaging Windows
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+import pandas as pd
+import numpy as np
+
+from price_inputs import load_daily_panel
+
+dt_path =  "<insert your home directory here>"
+
+"""
+Each window is defined relative to the priced month X by a start and an end
+as (month offset, day of month), both inclusive. Days beyond the end of a
+month are clipped to its last day. With bday=True only Monday-Friday
+observations enter the average.
+
+  - statutory: 25th of X-2 to 24th of X-1, as in Kepmen ESDM 62 K/12/MEM/2020
+  - calendar: full calendar month X-1
+  - lag_15: one month ending 15 days before month X, 16th of X-2 to 15th of X-1
+  - statutory_bday: statutory window, business days only
+"""
+
+window_defs = {
+    'statutory':      {'start':(-2,25),'end':(-1,24),'bday':False},
+    'calendar':       {'start':(-1,1), 'end':(-1,31),'bday':False},
+    'lag_15':         {'start':(-2,16),'end':(-1,15),'bday':False},
+    'statutory_bday': {'start':(-2,25),'end':(-1,24),'bday':True},
+    }
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+## Date of (month offset, day) relative to each month, clipped to month end
+def window_date(month,offset,day):
+    mo = np.asarray(month,dtype='datetime64[M]') + offset
+    dim = ((mo+1).astype('datetime64[D]') - mo.astype('datetime64[D]')).astype('int64')
+    return mo.astype('datetime64[D]') + np.minimum(day,dim) - 1
+
+"""
+The daily series is laid on a contiguous calendar-day grid and turned into
+prefix sums of value and count, once for all days and once for business days.
+The sum over any window is then the difference of two prefix sums, so every
+window definition and month costs O(1) after the O(n) pass.
+"""
+
+def build_prefix_sum(daily):
+
+    dt = daily.index.to_numpy().astype('datetime64[D]')
+    day0 = dt.min()
+    n_day = int((dt.max() - day0).astype('int64')) + 1
+    idx = (dt - day0).astype('int64')
+
+    obs = daily.notna().to_numpy()
+    val = np.zeros((n_day,daily.shape[1]))
+    cnt = np.zeros((n_day,daily.shape[1]))
+    np.add.at(val,idx,np.where(obs,daily.to_numpy(),0))
+    np.add.at(cnt,idx,obs)
+
+    grid = day0 + np.arange(n_day)
+    bday = np.is_busday(grid)[:,None]
+
+    prefix = lambda x: np.concatenate([np.zeros((1,x.shape[1])),np.cumsum(x,axis=0)])
+
+    return {'day0':day0,'n_day':n_day,
+            False:(prefix(val),prefix(cnt)),
+            True:(prefix(val*bday),prefix(cnt*bday))}
+
+def compute_window_panel(daily,month,window_defs=window_defs):
+
+    ps = build_prefix_sum(daily)
+    month = np.asarray(pd.PeriodIndex(month,freq='M').astype(str),dtype='datetime64[M]')
+
+    res = {}
+    for name, w in window_defs.items():
+        start = (window_date(month,*w['start']) - ps['day0']).astype('int64')
+        end = (window_date(month,*w['end']) - ps['day0']).astype('int64') + 1
+        start = np.clip(start,0,ps['n_day'])
+        end = np.clip(end,0,ps['n_day'])
+
+        val, cnt = ps[w['bday']]
+        tot = val[end] - val[start]
+        n = cnt[end] - cnt[start]
+        res[name] = pd.DataFrame(np.where(n>0,tot/np.where(n>0,n,1),np.nan),
+                                 columns=daily.columns)
+
+    panel = pd.concat(res,axis=1,names=['window','series'])
+    panel.index = pd.PeriodIndex(month.astype(str),freq='M',name='month')
+
+    return panel
+
+#############################################################################
+#   2. Compute Monthly Panel for All Window Definitions
+#############################################################################
+
+if __name__ == '__main__':
+
+    daily = load_daily_panel(dt_path)
+    month = pd.period_range('2022-01','2022-12',freq='M')
+
+    panel = compute_window_panel(daily,month)
+
+    print(panel.xs('USDIDR',axis=1,level='series'))
+    panel.to_csv(dt_path+'data/window_panel.csv')
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Break-Even USD/IDR and MOPS Level at which the Unit Subsidy Hits Zero
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+import pandas as pd
+import numpy as np
+
+from price_formula import round_up, subs_biogasoil, vat, fuel_tax, mops_ls, bound_ls
+from price_formula import bbl_to_ltr, margin, formula_sets, default_regime, evaluate_catalog
+from price_inputs import load_price_panel
+from subsidy_formula import load_price_schedule, curr_price_array
+
+dt_path =  "<insert your home directory here>"
+
+eoy_er = 15000 # End-of-year exchange rate projection
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+"""
+The unit subsidy is zero iff the formula retail price does not exceed the
+current price. With k = floor(current/rounding), ceil(x) <= k iff x <= k, so
+the 50-rupiah step can be inverted exactly:
+
+    retail <= current  iff  base <= (k*rounding/(1+fuel_tax) + subsidy)/(1+vat)
+
+and since base = ((MOPS x mult x ER)/bbl_to_ltr + cons) x (1+dist) x margin,
+the condition is MOPS x ER <= Q for a threshold Q of each month, product and
+bound. Break-even ER is Q/MOPS and break-even MOPS is Q/ER; at or below them
+the product is not subsidized. A threshold of zero means the product is
+subsidized at any positive ER and MOPS. Q is shaded down by a relative 1e-12
+so that the forward formula in floating point lands on the unsubsidized side.
+"""
+
+rel_tol = 1e-12
+
+def break_even_threshold(curr_p,catalog,subsidy=subs_biogasoil,
+                         rounding=round_up,vat=vat,fuel_tax=fuel_tax):
+
+    k = np.floor(np.asarray(curr_p,dtype='float64')/rounding)[...,None]
+    sub = (catalog['fixed_sub']*subsidy)[:,None]
+    base = (k*rounding/(1+fuel_tax) + sub)/(1+vat)
+
+    mult = np.array([margin,1]) * (1+catalog['dist'])[:,None]
+    q = (base/mult - catalog['cons'][:,None]) * bbl_to_ltr / catalog['mult'][:,None]
+
+    return np.maximum(q*(1-rel_tol),0)
+
+## Break-even ER given MOPS of shape (..., month, series); out (..., month, product, bound)
+def break_even_er(mops,curr_p,catalog,**kwargs):
+    col = (catalog['mops'][:,None] == np.array(mops_ls)).argmax(axis=-1)
+    prc = np.take(np.asarray(mops,dtype='float64'),col,axis=-1)
+    return break_even_threshold(curr_p,catalog,**kwargs) / prc[...,None]
+
+## Break-even MOPS (of each product's benchmark) given ER of shape (..., month)
+def break_even_mops(er,curr_p,catalog,**kwargs):
+    er = np.asarray(er,dtype='float64')
+    return break_even_threshold(curr_p,catalog,**kwargs) / er[...,None,None]
+
+## Long table of break-even ER and MOPS by month, product and bound
+def break_even_table(month,mops,er,curr_p,catalog,**kwargs):
+    be_er = break_even_er(mops,curr_p,catalog,**kwargs)
+    be_mops = break_even_mops(er,curr_p,catalog,**kwargs)
+    idx = pd.MultiIndex.from_product([month,catalog['gastype'],bound_ls],
+                                     names=['month','gastype','bound'])
+    return pd.DataFrame({'be_er':be_er.ravel(),'be_mops':be_mops.ravel()},index=idx)
+
+## Check: at break-even ER the unit subsidy is zero, one rupiah above it is not
+def check_break_even(mops,curr_p,catalog):
+    be_er = break_even_er(mops,curr_p,catalog)
+    for p in range(len(catalog)):
+        for b in range(len(bound_ls)):
+            er_at = be_er[:,p,b]
+            base, retail = evaluate_catalog(mops,np.stack([er_at,er_at+1]),catalog)
+            if not (retail[0,:,p,b] <= curr_p[:,p]).all():
+                raise ValueError("Subsidy at break-even ER: "+catalog['gastype'][p]+" "+bound_ls[b])
+            if not (retail[1,:,p,b] > curr_p[:,p]).all():
+                raise ValueError("No subsidy above break-even ER: "+catalog['gastype'][p]+" "+bound_ls[b])
+
+#############################################################################
+#   2. Compute Break-Even Surfaces for 2022
+#############################################################################
+
+if __name__ == '__main__':
+
+    price_df = load_price_panel(dt_path)
+    price_df.loc[price_df['USDIDR'].isnull(),'USDIDR'] = eoy_er
+
+    catalog = formula_sets[default_regime]
+    gastype_ls = list(catalog['gastype'])
+    curr_p = curr_price_array(price_df['month'],gastype_ls,
+                              load_price_schedule(dt_path))
+
+    res = break_even_table(price_df['month'].astype(str),price_df[mops_ls].to_numpy(),
+                           price_df['USDIDR'].to_numpy(),curr_p,catalog)
+    print(res.xs('min',level='bound').unstack('gastype'))
+
+    # Break-even ER surface over a MOPS grid (same shock on all series)
+    shock = np.linspace(0.5,1.5,101)[:,None,None]
+    surface = break_even_er(price_df[mops_ls].to_numpy()*shock,curr_p,catalog)
+    np.savez_compressed(dt_path+'data/break_even_surface.npz',be_er=surface,
+                        mops_shock=shock.ravel(),month=price_df['month'].astype(str).to_numpy(),
+                        gastype=catalog['gastype'],bound=np.array(bound_ls))
+
+    check_break_even(price_df[mops_ls].to_numpy(),curr_p,catalog)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Cached Consumption History and Projected Volume by Product and Year
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+import os
+from functools import lru_cache
+
+import pandas as pd
+import numpy as np
+
+from subsidy_formula import gas_type
+
+dt_path =  "<insert your home directory here>"
+
+hist_file = 'data/petrol_consumption_transport_sector.xlsx'
+cache_file = 'data/petrol_consumption_cache.npz'
+
+share_start = 2018 # First year of the average share
+
+## Input Reported 2019 Level of Fuel Sales at Gas Stations, 51.31 mil kL
+base_year = 2019
+base_level = 51.31*(10**9)
+
+## Assume that Fuel Sales growth track economic growth 1:1, growth of each year after base_year
+growth_path = np.array([-0.0207, 0.0369, 0.051]) # 2020, 2021, 2022
+
+#############################################################################
+#   1. Consumption History and Share
+#############################################################################
+
+"""
+Note: we do not have data on petrol consumption breakdown by type
+Therefore, detailed calculation needs to be inferred from the Kemen ESDM's
+historical data on petrol consumption by types.
+
+Admittedly, these figures include non-Pertamina sales; therefore, a conservative
+approach would be to use the share from Kemen ESDM's handbook and to apply
+these shares to reported 2019 sales (pre-Covid) from Pertamina, and assume
+that fuel consumption grows 1:1 with economic growth
+
+The parsed history is kept as (year, product) volume in
+data/petrol_consumption_cache.npz, re-parsed only when the spreadsheet is
+newer than the cache, and memoized within a run.
+"""
+
+# Kemen ESDM series of each product; Premium (RON88) is merged into Pertalite
+# and Solar (CN48) into Biosolar
+hist_series = {'biosolar':['Biogasoil','Gasoil_CN48'],
+               'pertalite':['RON90','RON88'],
+               'pertamax':['RON92'],
+               'turbo':['RON95_higher'],
+               'pertadex':['Gasoil_CN53'],
+               'dexlite':['Gasoil_CN51']}
+
+def parse_consumption_history(dt_path):
+    hist_cons = pd.read_excel(dt_path+hist_file)
+    vol = np.stack([hist_cons[hist_series[x]].sum(axis=1).to_numpy(dtype='int64')
+                    for x in gas_type],axis=-1)
+    return {'year':hist_cons['Year'].to_numpy(dtype='int64'),'vol':vol,
+            'gastype':np.array(gas_type)}
+
+@lru_cache(maxsize=None)
+def load_consumption_history(dt_path):
+
+    src, cache = dt_path+hist_file, dt_path+cache_file
+    if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(src):
+        with np.load(cache) as f:
+            hist = {x:f[x] for x in f.files}
+        if list(hist['gastype']) == gas_type:
+            return hist
+
+    hist = parse_consumption_history(dt_path)
+    np.savez(cache,**hist)
+    return hist
+
+## Average share of each product since start_year, (product,)
+def consumption_share(hist,gastype_ls,start_year=share_start):
+    vol = hist['vol'][hist['year']>=start_year].astype('float64')
+    shr = vol / vol.sum(axis=1,keepdims=True)
+
+    # Assert that individual share sum up to 100%
+    assert np.allclose(shr.sum(axis=1),1), "At least 1 row not sum up to 100%"
+
+    pos = [list(hist['gastype']).index(x) for x in gastype_ls]
+    return shr.mean(axis=0)[pos]
+
+#############################################################################
+#   2. Projected Volume
+#############################################################################
+
+"""
+A growth path is an array of annual growth rates for the years after
+base_year, (..., n_year); stacking paths as rows of a matrix gives one
+projection per growth scenario. The level of every year is one cumprod over
+[base_level, 1+g_1, 1+g_2, ...], so many scenarios x many years is a single
+array operation:
+
+    total  : (..., year) total volume, litre, from base_year on
+    volume : (..., year, product) total x average share
+"""
+
+def project_total(growth=growth_path,level=base_level):
+    growth = np.asarray(growth,dtype='float64')
+    level = np.broadcast_to(np.asarray(level,dtype='float64'),growth.shape[:-1])[...,None]
+    return np.cumprod(np.concatenate([level,1+growth],axis=-1),axis=-1)
+
+## Volume by product per period of each year, (..., year, product), and the
+## years; periods=12 gives the monthly volume with equal weight for each month
+def project_volume(dt_path,gastype_ls,growth=growth_path,level=base_level,
+                   start_year=share_start,periods=1):
+    shr = consumption_share(load_consumption_history(dt_path),gastype_ls,start_year)
+    total = project_total(growth,level)
+    years = base_year + np.arange(total.shape[-1])
+    return (total/periods)[...,None] * shr, years
+
+## Align (..., year, product) with the months of the pricing cube, (..., month, product)
+def align_months(vol,years,month):
+    yr = pd.PeriodIndex(month,freq='M').year.to_numpy()
+    pos = np.searchsorted(years,yr)
+    assert (years[np.minimum(pos,len(years)-1)] == yr).all(), "Year beyond the projection"
+    return np.take(vol,pos,axis=-2)
+
+## Monthly volume of a single year, (..., product)
+def monthly_volume(dt_path,gastype_ls,year=2022,**kwargs):
+    vol, years = project_volume(dt_path,gastype_ls,periods=12,**kwargs)
+    return np.take(vol,list(years).index(year),axis=-2)
+
+#############################################################################
+#   3. Projected Volume under Alternative Growth Paths
+#############################################################################
+
+if __name__ == '__main__':
+
+    # Growth scenario matrix: 2022 growth from 3% to 6% on the reported 2020-21 path
+    growth = np.tile(growth_path,(7,1))
+    growth[:,-1] = np.linspace(0.03,0.06,7)
+
+    annual, years = project_volume(dt_path,gas_type,growth)
+    print(pd.DataFrame(annual[:,-1]/(10**9),index=growth[:,-1],columns=gas_type))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Daily-Resolution Subsidy with Mid-Month Retail Price Changes Prorated
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+import pandas as pd
+import numpy as np
+
+from price_formula import mops_ls, bound_ls, formula_sets, default_regime, evaluate_catalog
+from price_inputs import load_price_panel
+from subsidy_formula import load_price_schedule, build_schedule_index, lookup_price
+from subsidy_formula import compute_subsidy_kernel
+from consumption_projection import project_volume
+
+dt_path =  "<insert your home directory here>"
+
+eoy_er_ls = [15000, 15750] # Baseline and 5% depreciation scenario
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+"""
+The monthly engine applies a price change within a month to the whole month
+and gives every month 1/12 of annual consumption. Here the horizon is laid out
+day by day instead:
+
+    formula retail : price of the day's month, (..., day, product, bound)
+    current retail : price in effect on the day, from the schedule (day, product)
+    volume         : annual volume / days in the year (day, product)
+
+so a month's subsidy is the sum over its days, weighting the formula price by
+calendar days and the old and new current price by the days each was in
+effect. Aggregation to months or years is a reduceat over the day axis.
+"""
+
+## Calendar days from start to end, both inclusive
+def day_grid(start,end):
+    return np.arange(np.datetime64(start,'D'),np.datetime64(end,'D')+1)
+
+## Position of each day's month in a (sorted) monthly array
+def day_month_pos(days,month):
+    mo = np.asarray(pd.PeriodIndex(month,freq='M').astype(str),dtype='datetime64[M]')
+    day_mo = days.astype('datetime64[M]')
+    pos = np.searchsorted(mo,day_mo)
+    assert (mo[np.minimum(pos,len(mo)-1)] == day_mo).all(), "Month missing for some day"
+    return pos
+
+## Daily volume (litre) by product, annual volume (..., year, product) of
+## consumption_projection.project_volume spread over the days of each year
+def daily_volume_array(annual,years,days):
+    yr = days.astype('datetime64[Y]')
+    n_day = ((yr+1).astype('datetime64[D]') - yr.astype('datetime64[D]')).astype('float64')
+    pos = np.searchsorted(years,yr.astype('int64')+1970)
+    return np.take(annual,pos,axis=-2) / n_day[:,None]
+
+## Daily subsidy (billion IDR), (..., day, product, bound)
+def daily_subsidy(retail,month,days,sched_index,vol):
+    pos = day_month_pos(days,month)
+    curr_p = lookup_price(sched_index,days)
+    return compute_subsidy_kernel(np.take(retail,pos,axis=-3),curr_p,vol)
+
+## Sum over the day axis into months ('M') or years ('Y'), (..., period, product, bound)
+def aggregate_daily(sub,days,freq='M'):
+    per = days.astype('datetime64['+freq+']')
+    start = np.flatnonzero(np.r_[True,per[1:]!=per[:-1]])
+    return np.add.reduceat(sub,start,axis=-3), per[start]
+
+#############################################################################
+#   2. Compute Daily Subsidy for 2022, Baseline and Depreciation Scenario
+#############################################################################
+
+if __name__ == '__main__':
+
+    price_df = load_price_panel(dt_path)
+    catalog = formula_sets[default_regime]
+    gastype_ls = list(catalog['gastype'])
+
+    # Stack both ER scenarios and price them in one pass
+    er = np.tile(price_df['USDIDR'].to_numpy(),(len(eoy_er_ls),1))
+    er = np.where(np.isnan(er),np.array(eoy_er_ls)[:,None],er)
+    base, retail = evaluate_catalog(price_df[mops_ls].to_numpy(),er,catalog)
+
+    days = day_grid('2022-01-01','2022-12-31')
+    sched_index = build_schedule_index(load_price_schedule(dt_path),gastype_ls)
+    vol = daily_volume_array(*project_volume(dt_path,gastype_ls),days)
+
+    sub = daily_subsidy(retail,price_df['month'],days,sched_index,vol)
+    sub_mo, mo = aggregate_daily(sub.sum(axis=-2,keepdims=True),days,'M')
+
+    for k,x in enumerate(eoy_er_ls):
+        print('EOY USD/IDR',x)
+        print(pd.DataFrame(sub_mo[k,:,0],index=mo.astype(str),
+                           columns=['tot_sub_'+b for b in bound_ls]))
+
+    # Annualized Subsidy (Stated in Billion IDR)
+    sub_yr, yr = aggregate_daily(sub,days,'Y')
+    print(pd.DataFrame(sub_yr[:,0].sum(axis=1),index=eoy_er_ls,
+                       columns=['tot_sub_'+b for b in bound_ls]))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Pool of Warm Headless Chrome Sessions Shared by the Platts Scrapers
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import NoAlertPresentException
+from concurrent.futures import ThreadPoolExecutor
+
+import os
+import queue
+
+exec_path = "<insert chromedriver path here>"
+
+mem_per_driver = 400 * 2**20 # Rough memory of one headless chart session, bytes
+
+# Requests the chart does not need: images, fonts and ad/analytics hosts
+# (not *.svg: the chart and legend draw some of their parts from SVG)
+blocked_urls = ['*.png','*.jpg','*.jpeg','*.gif','*.webp','*.ico',
+                '*.woff','*.woff2','*.ttf','*.otf',
+                '*doubleclick.net*','*googlesyndication.com*','*google-analytics.com*',
+                '*googletagmanager.com*','*facebook.net*','*adnxs.com*']
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+"""
+Each scraper task is a function fn(driver, item). The pool starts its Chrome
+sessions once, runs the tasks on them from a thread pool (the work is waiting
+on the browser, so threads are enough and no session is started per process),
+and hands each session back for the next symbol or contract month, which then
+loads in the same tab. Sessions are headless and block the requests listed in
+blocked_urls through the DevTools protocol.
+
+The pool also remembers which sessions have already had the chart toggle
+clicked: the first chart of a session takes one click, later charts two.
+Both Platts scrapers ask the pool, so a session handed from one scraper to
+the other is not taken for a fresh one.
+
+The number of sessions is bounded by the tasks at hand, the CPU count and the
+memory available.
+"""
+
+def make_options(headless=True):
+    options = Options()
+    if headless:
+        options.add_argument('--headless=new')
+    options.add_argument('--window-size=1920,1080') # chart layout and XPaths assume a desktop window
+    options.add_argument('--disable-popup-blocking') # differ on driver version. can ignore.
+    options.add_argument('--disable-notifications') # differ on driver version. can ignore.
+    options.add_argument('--disable-extensions')
+    options.add_experimental_option('prefs',{'profile.managed_default_content_settings.images':2})
+    options.set_capability('goog:loggingPrefs',{'performance':'ALL'}) # to read the chart's websocket frames
+    return options
+
+## Available memory in bytes, None where the platform does not report it
+def available_memory():
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def pool_size(n_task,mem_per_driver=mem_per_driver):
+    n = min(n_task, os.cpu_count() or 1)
+    mem = available_memory()
+    if mem is not None:
+        n = min(n, mem // mem_per_driver)
+    return max(int(n),1)
+
+def start_driver(options,exec_path=exec_path):
+    driver = webdriver.Chrome(service=Service(exec_path),options=options)
+    driver.execute_cdp_cmd('Network.enable',{})
+    driver.execute_cdp_cmd('Network.setBlockedURLs',{'urls':blocked_urls})
+    return driver
+
+## Dismiss a leave-page alert so the tab can load the next chart
+def release_page(driver):
+    try:
+        driver.switch_to.alert.accept()
+    except NoAlertPresentException:
+        pass
+
+class DriverPool:
+
+    def __init__(self,size,headless=True,exec_path=exec_path):
+        self.size = size
+        self.idle = queue.Queue()
+        self.toggled = set() # Sessions whose chart toggle has been clicked
+        options = make_options(headless)
+        with ThreadPoolExecutor(size) as ex:
+            for driver in ex.map(lambda i: start_driver(options,exec_path),range(size)):
+                self.idle.put(driver)
+
+    ## Run fn(driver, item) on a warm session
+    def run(self,fn,item):
+        driver = self.idle.get()
+        try:
+            return fn(driver,item)
+        finally:
+            release_page(driver)
+            self.idle.put(driver)
+
+    ## Clicks on the chart toggle this session needs: one on its first chart, two after that
+    def toggle_clicks(self,driver):
+        n_click = 2 if driver.session_id in self.toggled else 1
+        self.toggled.add(driver.session_id)
+        return n_click
+
+    ## Results in the order of items
+    def map(self,fn,items):
+        with ThreadPoolExecutor(self.size) as ex:
+            return list(ex.map(lambda x: self.run(fn,x),items))
+
+    def close(self):
+        while not self.idle.empty():
+            try:
+                self.idle.get_nowait().quit()
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        self.close()
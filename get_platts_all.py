@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Update Platts Spot and Futures Prices on One Pool of Browser Sessions
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+from driver_pool import DriverPool, pool_size
+
+import get_platts_price
+import get_platts_future
+
+exec_path = "<insert chromedriver path here>"
+headless = True # Run the pooled Chrome sessions without a window
+
+#############################################################################
+#   1. Run Both Scrapes on the Same Warm Sessions
+#############################################################################
+
+"""
+The sessions are started once, sized for the larger of the two task lists
+(the futures contracts), and the spot series and the futures curve are both
+scraped on them one after the other.
+"""
+
+if __name__ == '__main__':
+
+    n_task = max(len(get_platts_price.mp_dict),len(get_platts_future.contract_ls))
+
+    with DriverPool(pool_size(n_task),headless,exec_path) as pool:
+        get_platts_price.update_platts_price(pool)
+        get_platts_future.update_platts_futures(pool)
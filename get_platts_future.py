@@ -9,18 +9,18 @@ Author: @sihir_sains
 #   0. Load Necessary Library and Set Up Necessary Variables
 #############################################################################
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait as WDW
 from selenium.webdriver.support import expected_conditions as EC
-from multiprocessing import get_context
+from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import StaleElementReferenceException
 
 import pandas as pd
-import numpy as np
-import time 
 import re
 
+from driver_pool import DriverPool, pool_size
+from scrape_log import log_file, read_log, append_log, merge_csv, clear_logs
+
 exec_path = "<insert chromedriver path here>"
 out_path =  "<insert your home directory here>"
 
@@ -30,132 +30,139 @@ url_mo92 = 'https://www.tradingview.com/chart/?symbol=NYMEX%3AN1B'
 url_gs10 = 'https://www.tradingview.com/chart/?symbol=NYMEX%3ASGB'
 url_gs500 = 'https://www.tradingview.com/chart/?symbol=NYMEX%3AGHS'
 
-options = Options()
-options.add_argument('--disable-popup-blocking') # differ on driver version. can ignore. 
-options.add_argument('--disable-notifications') # differ on driver version. can ignore. 
+headless = True # Run the pooled Chrome sessions without a window
+max_refresh = 3 # Page reloads before giving up on a chart
 
 # Get List of Months for Futures Price in NYMEX
 nymex_mo = ['F','G','H','J','K','M','N','Q','U','V','X','Z']
-yrs = ['2022']
+yrs = ['2022','2023'] # Contract years of the curve
+
+log_name = 'platts_price_futures' # Scrape log of this scraper, under data/scrape_log/
 
 #############################################################################
 #   1. Define Sub-Functions
 #############################################################################
 
-## To wait when initializing the page until elements are located
+## To wait when initializing the page until elements are located, reloading a few times at most
 def wait_at_start(driver):
-    while True:
+    for i in range(max_refresh+1):
         try:
             WDW(driver,10).until(EC.presence_of_element_located(
                 (By.XPATH, '/html/body/div[2]/div[6]/div/div[2]/div/div/div/div/div[4]')))
-            break
-        except:
+            return
+        except TimeoutException:
             driver.refresh()
-            continue
-
-## To fetch closing price at a given date
-def fetch_price(driver):
-    date  = WDW(driver,5).until(EC.presence_of_element_located(
-            (By.XPATH , '''/html/body/div[2]/div[1]/div[2]/div[1]/div/table/
-             tr[1]/td[2]/div/div[2]/div[1]/div[1]/div[1]/div[1]/div[1]'''))).text
-    close = WDW(driver,5).until(EC.presence_of_element_located(
-            (By.XPATH , '''/html/body/div[2]/div[6]/div/div[1]/div[1]/div[5]/
-             div/div[2]/div[1]/div[2]/div[2]/div[4]/div[2]/span'''))).text
-    return date, close
+    raise TimeoutException("Chart did not load: "+driver.current_url)
+
+## XPath of the contract title (holding the delivery month) and the legend close
+xpath_title = '/html/body/div[2]/div[1]/div[2]/div[1]/div/table/tr[1]/td[2]/div/div[2]/div[1]/div[1]/div[1]/div[1]/div[1]'
+xpath_close = '/html/body/div[2]/div[6]/div/div[1]/div[1]/div[5]/div/div[2]/div[1]/div[2]/div[2]/div[4]/div[2]/span'
+xpath_toggle = '/html/body/div[2]/div[6]/div/div[2]/div/div/div/div/div[4]'
 
 def extract_date_string(txt):
     return re.findall(r'\((.*?)\)',txt)[1].title()
 
+## Readiness condition: the title names this contract's delivery month and the legend shows a close
+def contract_ready(mo,yr):
+    def ready(driver):
+        title = driver.find_element(By.XPATH,xpath_title).text
+        close = driver.find_element(By.XPATH,xpath_close).text
+        if len(re.findall(r'\((.*?)\)',title)) < 2 or close in ['','∅']:
+            return False
+        try:
+            month = pd.Period(extract_date_string(title),freq='M')
+        except (ValueError, TypeError): # title still rendering, poll again
+            return False
+        if (month.year != int(yr)) or (nymex_mo[month.month-1] != mo):
+            return False
+        return title, close
+    return ready
+
+## To fetch closing price of a contract once the chart shows it
+def fetch_price(driver,mo,yr):
+    return WDW(driver,10,ignored_exceptions=[NoSuchElementException,StaleElementReferenceException])\
+        .until(contract_ready(mo,yr))
+
 #############################################################################
 #   2. Create Wrapper Function for Webscraping
 #############################################################################
 
-def webscrape_fut_prc(comms):
+"""
+Every contract (commodity, year, month) is its own task, so the contracts of
+all commodities and years load at the same time across the pooled sessions.
+Instead of fixed sleeps, each task waits until the chart title names the
+requested delivery month and the legend holds a close. The first chart of a
+session takes one click on the toggle, later charts two, as before; the pool
+keeps count per session (DriverPool.toggle_clicks).
+
+Each contract read is appended to its commodity's scrape log at once, so a
+rerun after a crash only loads the contracts not logged yet.
+"""
+
+def webscrape_fut_prc(driver,contract,pool):
+    
+    comms, yr, mo = contract
+    driver.get(mp_dict[comms]+mo+yr)
+    wait_at_start(driver)
     
-    ### Variables and Dataframe Setup, Initialize Webdriver ###
-        
-    url_comms = mp_dict[comms]
-    cols = ['date',comms]
-    fut_df = pd.DataFrame(columns=cols)
+    for i in range(pool.toggle_clicks(driver)):
+        WDW(driver,10).until(EC.element_to_be_clickable((By.XPATH, xpath_toggle))).click()
     
-  
-    driver = webdriver.Chrome(executable_path=exec_path,options=options)
+    title, close = fetch_price(driver,mo,yr)
+    append_log(log_file(out_path,log_name,comms),[[mo+yr,extract_date_string(title),close]])
+    return comms, extract_date_string(title), close
+
+## Futures curve, (month, commodity)
+def collect_fut_prc(res):
     
-    ### Loop to Obtain YTD Price Dataset ###
-    for yr in yrs:
-        for mo in nymex_mo:       
-            driver.get(url_comms+mo+yr)
-            
-            wait_at_start(driver)
-            
-            if (yr == yrs[0]) & (mo == nymex_mo[0]):
-                WDW(driver,10).until(EC.presence_of_element_located(
-                    (By.XPATH, '/html/body/div[2]/div[6]/div/div[2]/div/div/div/div/div[4]'))).click()
-            else:
-                WDW(driver,10).until(EC.presence_of_element_located(
-                    (By.XPATH, '/html/body/div[2]/div[6]/div/div[2]/div/div/div/div/div[4]'))).click()
-                WDW(driver,10).until(EC.presence_of_element_located(
-                    (By.XPATH, '/html/body/div[2]/div[6]/div/div[2]/div/div/div/div/div[4]'))).click()
-            
-            time.sleep(2)
-            temp_ls = [fetch_price(driver)]
-            temp_df = pd.DataFrame(temp_ls,columns=cols)
-            
-            fut_df = pd.concat([fut_df,temp_df],axis=0)
-            time.sleep(2)
-            
-            
+    fut_df = pd.DataFrame(res,columns=['comms','date','close'])
     
     ### Ensure No Duplicate Date (Same Date, Different Closing Price) ###
-    fut_df['date'] = np.vectorize(extract_date_string)(fut_df['date'])
-
     fut_df = fut_df.drop_duplicates().reset_index(drop=True)
-    fut_df['dup'] = fut_df.duplicated(subset='date')
-    assert fut_df['dup'].unique().shape[0], "Duplicate obs identified!"
+    assert not fut_df.duplicated(subset=['comms','date']).any(), "Duplicate obs identified!"
     
     ### Clean Price Dataset ###
     
     fut_df['month'] = pd.to_datetime(fut_df['date']).dt.to_period('M')
-    fut_df = fut_df[['month',comms]].set_index(['month'])
-    
-    ### Close Webdriver ###
-    try:
-        driver.close()
-    except:
-        alert = WDW(driver, 3).until(EC.alert_is_present())
-        alert.accept()
-        driver.close()
-
+    fut_df = fut_df.pivot(index='month',columns='comms',values='close')
     
-    return fut_df
+    return fut_df[[x for x in colname if x in fut_df.columns]]
 
 #############################################################################
 #   3. Fetch Closing Price Time Series by Commodities
 #############################################################################
 
-### Multiprocess the webscraping
+### Scrape the contracts on a pool of warm browser sessions
 
 colname = ['mogas_92','mogas_95','gasoil_10','gasoil_500']
 to_mp = [url_mo92, url_mo95, url_gs10, url_gs500]
 mp_dict = dict(zip(colname,to_mp))
 
-if __name__ == '__main__':
-    with get_context("spawn").Pool(processes=4) as p:
-        res = p.map(webscrape_fut_prc,mp_dict)
-        p.close()
-        p.join()
-        
-        consol_prc = pd.concat(res,axis=1)
-                
-else:
-    pass
+contract_ls = [(comms,yr,mo) for comms in colname for yr in yrs for mo in nymex_mo]
 
-#############################################################################
-#   4. Clean and Process the Platts Price Dataset
-#############################################################################
+## Scrape the contracts not logged yet on the given DriverPool and merge the curve
+def update_platts_futures(pool):
+    
+    # Contracts already logged by an earlier, interrupted run
+    logged = {x:read_log(log_file(out_path,log_name,x)) for x in colname}
+    res = [(x,)+tuple(v) for x in colname for v in logged[x].values()]
+    pending = [c for c in contract_ls if c[2]+c[1] not in logged[c[0]]]
+    
+    res = res + pool.map(lambda driver,c: webscrape_fut_prc(driver,c,pool),pending)
+    consol_prc = collect_fut_prc(res)
+    
+    ### Merge into the Platts Futures Price Dataset ###
     
-try:
     print(consol_prc)
-    consol_prc.to_csv(out_path+'data/platts_price_futures.csv') 
-except:
-    pass
+    merge_csv(out_path+'data/platts_price_futures.csv',consol_prc)
+    clear_logs(out_path,log_name)
+    
+    return consol_prc
+
+#############################################################################
+#   4. Update the Platts Futures Price Dataset
+#############################################################################
+
+if __name__ == '__main__':
+    with DriverPool(pool_size(len(contract_ls)),headless,exec_path) as pool:
+        update_platts_futures(pool)
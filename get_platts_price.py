@@ -10,17 +10,23 @@ Author: @sihir_sains
 #   0. Load Necessary Library and Set Up Necessary Variables
 #############################################################################
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait as WDW
 from selenium.webdriver.support import expected_conditions as EC
-from multiprocessing import get_context
+from selenium.common.exceptions import TimeoutException
 
 import pandas as pd
+import numpy as np
+import json
 import time
 
+from tradingview_payload import parse_series_payload
+from driver_pool import DriverPool, pool_size
+from scrape_log import log_file, checkpoint_file, read_log, append_log
+from scrape_log import read_checkpoint, write_checkpoint, merge_csv, clear_logs, update_notice
+from price_inputs import ref_month_index
+
 exec_path = "<insert chromedriver path here>"
 out_path =  "<insert your home directory here>"
 
@@ -30,67 +36,248 @@ url_mo92 = 'https://www.tradingview.com/chart/?symbol=NYMEX%3AN1B1!'
 url_gs10 = 'https://www.tradingview.com/chart/?symbol=NYMEX%3ASGB1!'
 url_gs500 = 'https://www.tradingview.com/chart/?symbol=NYMEX%3AGHS1!'
 
-options = Options()
-options.add_argument('--disable-popup-blocking') # differ on driver version. can ignore. 
-options.add_argument('--disable-notifications') # differ on driver version. can ignore. 
+headless = True # Run the pooled Chrome sessions without a window
+max_refresh = 3 # Page reloads before giving up on a chart
+
+# 'mouse': sweep the chart legend, 'payload': read the chart data payload (only checked
+# against a synthetic fixture so far, see tradingview_payload.py)
+scrape_mode = 'mouse'
+update_mode = 'incremental' # 'incremental': only dates from the last stored one on, 'full': whole chart
+payload_timeout = 30 # Seconds to wait for the chart series to complete
+legend_wait = 0.15 # Seconds for the legend to follow a mouse move
+checkpoint_every = 20 # Sweep steps between checkpoints
+log_name = 'platts_price' # Scrape log of this scraper, under data/scrape_log/
 
 
 #############################################################################
 #   1. Define Sub-Functions
 #############################################################################
 
-## To wait when initializing the page until elements are located
+## To wait when initializing the page until elements are located, reloading a few times at most
 def wait_at_start(driver):
-    while True:
+    for i in range(max_refresh+1):
         try:
             WDW(driver,15).until(EC.presence_of_element_located(
                 (By.XPATH, '/html/body/div[2]/div[6]/div/div[2]/div/div/div/div/div[4]')))
-            break
-        except:
+            return
+        except TimeoutException:
             driver.refresh()
-            continue
+    raise TimeoutException("Chart did not load: "+driver.current_url)
+
+## XPath of the chart legend date and close
+xpath_date = '/html/body/div[2]/div[6]/div/div[1]/div[1]/div[5]/div/div[2]/div[1]/div[1]/div[2]/div/div[2]/span'
+xpath_close = '/html/body/div[2]/div[6]/div/div[1]/div[1]/div[5]/div/div[2]/div[1]/div[2]/div[2]/div[4]/div[2]/span'
 
-## To fetch closing price at a given date
+js_legend = """
+    const get = p => {
+        const e = document.evaluate(p, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        return e === null ? null : e.textContent;
+    };
+    return [get(arguments[0]), get(arguments[1])];
+"""
+
+## To fetch closing price at a given date, both legend fields read in one script call
 def fetch_price(driver):
-    date  = WDW(driver,5).until(EC.presence_of_element_located(
-            (By.XPATH , '''/html/body/div[2]/div[6]/div/div[1]/div[1]/div[5]/
-             div/div[2]/div[1]/div[1]/div[2]/div/div[2]/span'''))).text
-    close = WDW(driver,5).until(EC.presence_of_element_located(
-            (By.XPATH , '''/html/body/div[2]/div[6]/div/div[1]/div[1]/div[5]/
-             div/div[2]/div[1]/div[2]/div[2]/div[4]/div[2]/span'''))).text
-    return date, close
-
-## Sub-function to slightly move mouse until the next date
-def move_mouse(driver):
+    WDW(driver,5).until(EC.presence_of_element_located((By.XPATH, xpath_close)))
+    return tuple(driver.execute_script(js_legend,xpath_date,xpath_close))
+
+## Sub-function to move mouse to the right by dx pixels
+def move_mouse(driver,dx=1):
     ActionChains(driver)\
-        .move_by_offset(1, 0)\
+        .move_by_offset(dx, 0)\
         .perform()
+
+## Legend reading once it shows a date (not the empty placeholder)
+def fetch_dated(driver,timeout=15):
+    def dated(d):
+        now = fetch_price(d)
+        return now if now[0] not in [None,'','∅'] else False
+    return WDW(driver,timeout,poll_frequency=0.1).until(dated)
+
+## Move the mouse, then read the legend once it shows another bar than prev,
+## or after legend_wait seconds when the cursor stayed on the same bar
+def move_and_fetch(driver,dx,prev):
+    move_mouse(driver,dx)
+    def moved(d):
+        now = fetch_price(d)
+        return now if now != tuple(prev) else False
+    try:
+        return WDW(driver,legend_wait,poll_frequency=0.02).until(moved)
+    except TimeoutException:
+        return fetch_price(driver)
+
+## Bar spacing in pixels, from the distance covered by n_bar date changes
+## Bars passed on the way go to record(date, close); leaves the cursor mid-bar
+## Returns the spacing and the pixels moved; direction -1 measures leftwards
+def measure_bar_width(driver,record,n_bar=5,max_px=500,direction=1):
+    prev, px, edge = fetch_price(driver), 0, []
+    date = prev[0]
+    while len(edge) <= n_bar and px < max_px:
+        prev = move_and_fetch(driver,direction,prev)
+        px = px + 1
+        new, close = prev
+        if new != date:
+            edge.append(px)
+            date = new
+        record(date,close)
+    if len(edge) <= n_bar:
+        raise RuntimeError("Could not measure bar width")
+    width = (edge[-1] - edge[0]) / n_bar
+    move_and_fetch(driver,direction*max(int(width/2),0),prev)
+    return width, px + max(int(width/2),0)
+
+## Sweep leftwards from the latest bar, one bar per step, until a date on/before since
+def sweep_back(driver,record,since,max_stale=5):
+    
+    axis = driver.find_element(By.CSS_SELECTOR,'.price-axis')
+    ActionChains(driver)\
+        .move_to_element(axis)\
+        .move_by_offset(-(axis.size['width']//2 + 1), 0)\
+        .perform()
+    
+    width = measure_bar_width(driver,record,direction=-1)[0]
+    date, close = fetch_price(driver)
+    pos, state_var = 0.0, 0
+    
+    while True:
+        
+        record(date,close)
+        reached = date != '∅' and pd.to_datetime(date).date() <= since
+        if reached or state_var > max_stale:
+            break
+        
+        step = round(pos + width) - round(pos) if state_var == 0 else 1
+        pos = pos + step
+        prev = (date,close)
+        date, close = move_and_fetch(driver,-step,prev)
+        state_var = state_var + 1 if (date,close) == prev else 0
+    
+    # A stalled sweep would leave a gap between since and the bars read
+    if not reached:
+        raise RuntimeError("Sweep stalled at "+str(date)+" before reaching "+str(since))
+
+## Latest date stored for every series (the earliest of their last dates), so
+## no series has a gap; None if some series has no data yet
+def last_stored(fn):
+    try:
+        stored = pd.read_csv(fn,parse_dates=['data_dt'])
+    except FileNotFoundError:
+        return None
+    last = [stored.loc[stored[x].notnull(),'data_dt'].max() if x in stored.columns else pd.NaT
+            for x in colname]
+    return None if pd.isnull(last).any() else min(last).date()
+
+## Split scraped rows into new dates and stored dates whose value is blank or differs
+def split_update(fn,new_df):
+    try:
+        stored = pd.read_csv(fn,parse_dates=['data_dt'])
+    except FileNotFoundError:
+        return new_df, new_df.iloc[:0]
+    stored['data_dt'] = stored['data_dt'].dt.date
+    stored = stored.groupby('data_dt').last()
+    
+    is_old = new_df.index.isin(stored.index)
+    new_num = new_df.loc[is_old].apply(pd.to_numeric,errors='coerce')
+    ref = stored.reindex(index=new_num.index,columns=new_num.columns)
+    diff = new_num.notnull() & ~np.isclose(new_num,ref)
+    return new_df.loc[~is_old], new_df.loc[is_old].where(diff).dropna(how='all')
+
+## Hand the reference months to recompute to nowcast_subsidy.py, adding to a notice
+## it has not read yet; reload asks for a full re-read of platts_price.csv
+def notify_nowcast(dt_path,ref_mo,reload):
+    fn = dt_path+update_notice
+    old = read_checkpoint(fn)
+    write_checkpoint(fn,{'ref_month':sorted(set(old.get('ref_month',[])) | set(ref_mo)),
+                         'reload':bool(old.get('reload',False) or reload)})
+
+## Rows dated on or after since (the bar of since is fetched again, its close may
+## have been provisional when stored)
+def from_date(price_df,since):
+    if since is None:
+        return price_df
+    return price_df.loc[np.array([x >= since for x in price_df.index],dtype=bool)]
+
+## To collect websocket frames received by the page until the chart series is complete
+## Raises if the series does not complete in time, so a partial series is not kept
+def fetch_payload(driver,timeout=payload_timeout):
+    frames = []
+    t_end = time.time() + timeout
+    while time.time() < t_end:
+        for entry in driver.get_log('performance'):
+            msg = json.loads(entry['message'])['message']
+            if msg['method'] == 'Network.webSocketFrameReceived':
+                frames.append(msg['params']['response']['payloadData'])
+        if any('"series_completed"' in x for x in frames):
+            return frames
+        time.sleep(0.5)
+    raise TimeoutException("Chart series did not complete: "+driver.current_url)
     
 #############################################################################
 #   2. Create Wrapper Function for Webscraping
 #############################################################################
 
-def webscrape_price(comms):
+"""
+The sweep reads the chart legend under the cursor. The legend shows the
+latest bar while the cursor is off the chart, which gives the date to stop
+at. The bar spacing is measured once from a few date changes, then the
+cursor moves one bar per step, keeping the fractional position so rounding
+does not drift over a year of bars. After each move the legend is read once
+it shows a new bar, waiting at most legend_wait seconds. A step that lands on
+the same bar again is nudged one pixel and not recorded twice.
+
+In incremental mode (since set to the last date stored for all series) the
+sweep starts at the latest bar instead and walks back only until it reaches
+a date on or before since; a sweep that stalls before then raises and is not
+checkpointed as done. The latest bar is read once the legend shows a date.
+
+Each new reading is appended to the symbol's scrape log, and every
+checkpoint_every steps the cursor offset and bar spacing are checkpointed
+with the last date of the chart. A rerun on the same chart moves the cursor
+straight to the checkpointed offset and continues from there. A sweep that
+stalls before the last date raises as well, and is not checkpointed as done.
+
+The chart toggle is clicked as many times as the pool says the session needs
+(DriverPool.toggle_clicks), since sessions are shared with other symbols and
+with the futures scrape.
+"""
+
+## Scraped rows of a symbol as a frame indexed by data_dt
+def log_frame(price_dict,comms):
+    price_df = pd.DataFrame([(k,v[0]) for k,v in price_dict.items()],columns=['date',comms])
+    price_df = price_df.loc[price_df['date']!='∅']
+    price_df['data_dt'] = pd.to_datetime(price_df['date']).dt.date
+    if price_df['data_dt'].duplicated().any():
+        raise ValueError("Duplicate obs identified for "+comms+": "+
+                         str(price_df.loc[price_df['data_dt'].duplicated(keep=False),'date'].tolist()))
+    return price_df[['data_dt',comms]].set_index(['data_dt'])
+
+def webscrape_price(driver,comms,since,pool):
     
-    ### Variables and Dataframe Setup ###
+    ### Variables Setup, Resume from the Scrape Log ###
     
     url_comms = mp_dict[comms]
-    dup_threshold = 80
+    max_stale = 5 # Consecutive steps with an unchanged reading before giving up
+    
+    log_fn = log_file(out_path,log_name,comms)
+    ckpt_fn = checkpoint_file(out_path,log_name,comms)
+    price_dict, ckpt = read_log(log_fn), read_checkpoint(ckpt_fn)
+    if ckpt.get('done'):
+        return from_date(log_frame(price_dict,comms),since)
     
-    cols = ['date',comms]
-    price_df = pd.DataFrame(columns=cols)
-    ls_prev = pd.DataFrame(columns=cols)
-    state_var = 0 # Initializing state var to count # of duplicate observation    
+    def record(date,close):
+        if price_dict.get(date) != [close]:
+            price_dict[date] = [close]
+            append_log(log_fn,[[date,close]])
     
     
-    ### Loop to Obtain 1-Year Period Price Dataset ###
+    ### Load the Chart ###
     
-    driver = webdriver.Chrome(executable_path=exec_path,options=options)
     driver.get(url_comms)
     
     wait_at_start(driver)
-    WDW(driver,15).until(EC.presence_of_element_located(
-        (By.XPATH, '/html/body/div[2]/div[6]/div/div[2]/div/div/div/div/div[4]'))).click()
+    for i in range(pool.toggle_clicks(driver)):
+        WDW(driver,15).until(EC.element_to_be_clickable(
+            (By.XPATH, '/html/body/div[2]/div[6]/div/div[2]/div/div/div/div/div[4]'))).click()
     WDW(driver,15).until(EC.presence_of_element_located(
         (By.XPATH, '/html/body/div[2]/div[1]/div[1]/div/div[2]/div/div[1]/div[7]'))).click()
     
@@ -98,45 +285,82 @@ def webscrape_price(comms):
     ActionChains(driver)\
         .move_to_element(start_point)\
         .perform()
+    last = fetch_dated(driver)
+    last_date = last[0]
+    
+    
+    ### Incremental Update: Only the Bars from the Last Stored Date On ###
+    
+    if since is not None:
+        record(*last)
+        if pd.to_datetime(last_date).date() > since:
+            sweep_back(driver,record,since,max_stale)
+        write_checkpoint(ckpt_fn,{'done':True})
+        return from_date(log_frame(price_dict,comms),since)
+    
+    
+    ### Sweep One Bar per Step Until the Last Date ###
+    
+    if ckpt.get('last_date') == last_date:
+        width, offset, pos = ckpt['width'], ckpt['offset'], ckpt['pos']
+        date, close = move_and_fetch(driver,offset+round(pos),last)
+    else:
+        (width, offset), pos = measure_bar_width(driver,record), 0.0
+        date, close = fetch_price(driver)
     
-    ### Loop to Obtain YTD Price Dataset ###
-    while state_var <= dup_threshold:
+    state_var, n_step = 0, 0
+    
+    while True:
         
-        temp_ls = [fetch_price(driver)]
-        temp_df = pd.DataFrame(temp_ls,columns=cols)
+        record(date,close)
+        if date == last_date or state_var > max_stale:
+            break
         
-        if temp_df.equals(ls_prev):
-            state_var = state_var + 1
-            ls_prev = temp_df
-        else:
-            state_var = 0
-            ls_prev = temp_df
+        step = round(pos + width) - round(pos) if state_var == 0 else 1
+        pos, n_step = pos + step, n_step + 1
+        prev = (date,close)
+        date, close = move_and_fetch(driver,step,prev)
+        state_var = state_var + 1 if (date,close) == prev else 0
         
-        price_df = pd.concat([price_df,temp_df],axis=0)
-        move_mouse(driver)
-        time.sleep(0.15)
+        if n_step % checkpoint_every == 0:
+            write_checkpoint(ckpt_fn,{'last_date':last_date,'width':width,'offset':offset,'pos':pos})
     
+    # A stalled sweep would cut the series short of the last date
+    if date != last_date:
+        raise RuntimeError("Sweep stalled at "+str(date)+" before reaching "+str(last_date))
     
-    ### Ensure No Duplicate Date (Same Date, Different Closing Price) ###
-    price_df = price_df.drop_duplicates().reset_index(drop=True)
+    write_checkpoint(ckpt_fn,{'done':True})
     
-    price_df = price_df.loc[price_df['date']!='∅']
-    price_df['dup'] = price_df.duplicated(subset='date')
-    assert price_df['dup'].unique().shape[0], "Duplicate obs identified!"
+    return log_frame(price_dict,comms)
+
+"""
+The chart loads the whole daily series of the symbol over its websocket when
+the page opens, so reading those frames from the browser's performance log
+gives every bar in one page load (see tradingview_payload.py for the format,
+and data/fixtures/ for a saved payload to test the parser against).
+"""
+
+def webscrape_price_payload(driver,comms,since=None):
     
-    ### Clean Price Dataset ###
+    log_fn = log_file(out_path,log_name,comms)
+    ckpt_fn = checkpoint_file(out_path,log_name,comms)
+    if read_checkpoint(ckpt_fn).get('done'):
+        price_df = pd.DataFrame.from_dict(read_log(log_fn),orient='index',columns=[comms])
+        price_df.index = pd.to_datetime(price_df.index).date
+        return from_date(price_df.rename_axis('data_dt'),since)
     
-    price_df['data_dt'] = pd.to_datetime(price_df['date']).dt.date
-    price_df = price_df[['data_dt',comms]].set_index(['data_dt'])
+    driver.get_log('performance') # drop frames of the previous chart in this session
+    driver.get(mp_dict[comms])
     
-    ### Close Webdriver ###
-    try:
-        driver.close()
-    except:
-        alert = WDW(driver, 3).until(EC.alert_is_present())
-        alert.accept()
-        driver.close()
-
+    wait_at_start(driver)
+    frames = fetch_payload(driver)
+    
+    price_df = parse_series_payload(frames)
+    assert not price_df.empty, "No chart series received for "+comms
+    price_df = from_date(price_df[['close']].rename(columns={'close':comms}),since)
+    
+    append_log(log_fn,[[str(k),v] for k,v in price_df[comms].items()])
+    write_checkpoint(ckpt_fn,{'done':True})
     
     return price_df
 
@@ -144,29 +368,59 @@ def webscrape_price(comms):
 #   3. Fetch Closing Price Time Series by Commodities
 #############################################################################
 
-### Multiprocess the webscraping
+### Scrape the symbols on a pool of warm browser sessions
 
 colname = ['mogas_92','mogas_95','gasoil_10','gasoil_500']
 to_mp = [url_mo92, url_mo95, url_gs10, url_gs500]
 mp_dict = dict(zip(colname,to_mp))
 
-if __name__ == '__main__':
-    with get_context("spawn").Pool(processes=4) as p:
-        res = p.map(webscrape_price,mp_dict)
-        p.close()
-        p.join()
-        
-        consol_prc = pd.concat(res,axis=1)
-                
-else:
-    pass
+"""
+An incremental update asks every series for the bars from the same date on,
+the last one stored for all of them; that bar is read again, as its close
+may have been stored while the session was still open. Of the rows that come back, new dates
+are appended to platts_price.csv; stored dates are only rewritten where the
+stored value is blank or differs. The reference months of all these dates
+are handed to nowcast_subsidy.py through data/platts_update.json, with a
+full reload requested when a stored row was rewritten (the nowcast otherwise
+only reads the appended part of the file).
+
+The scrape runs on a DriverPool passed in, so get_platts_all.py can run it
+together with the futures scrape on the same warm sessions.
+"""
+
+def update_platts_price(pool):
+    
+    fn = out_path+'data/platts_price.csv'
+    
+    # Last date stored for all series (incremental update only)
+    since = last_stored(fn) if update_mode == 'incremental' else None
+    
+    if scrape_mode == 'mouse':
+        task = lambda driver,x: webscrape_price(driver,x,since,pool)
+    else:
+        task = lambda driver,x: webscrape_price_payload(driver,x,since)
+    res = pool.map(task,mp_dict)
+    consol_prc = pd.concat(res,axis=1).sort_index()
+    consol_prc.index.name = 'data_dt'
+    
+    ### Merge into the Platts Price Dataset ###
+    
+    append, update = split_update(fn,consol_prc)
+    print(pd.concat([update,append]))
+    if append.shape[0] + update.shape[0] > 0:
+        merge_csv(fn,pd.concat([update,append]))
+        ref_mo = np.unique(ref_month_index(np.r_[update.index.astype(str),append.index.astype(str)]))
+        notify_nowcast(out_path,ref_mo.astype(str),update.shape[0] > 0)
+        print('Reference months to recompute:',', '.join(ref_mo.astype(str)),
+              '(full reload)' if update.shape[0] > 0 else '')
+    clear_logs(out_path,log_name)
+    
+    return consol_prc
 
 #############################################################################
-#   4. Clean and Process the Platts Price Dataset
+#   4. Update the Platts Price Dataset
 #############################################################################
 
-try:
-    print(consol_prc)
-    consol_prc.to_csv(out_path+'data/platts_price.csv') 
-except:
-    pass
\ No newline at end of file
+if __name__ == '__main__':
+    with DriverPool(pool_size(len(mp_dict)),headless,exec_path) as pool:
+        update_platts_price(pool)
\ No newline at end of file
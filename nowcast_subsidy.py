@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Incremental Nowcast of Monthly Retail Price and Subsidy as Daily Data Arrive
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+import hashlib
+import io
+import os
+import time
+
+import pandas as pd
+import numpy as np
+
+from price_formula import mops_ls, formula_sets, default_regime, evaluate_catalog
+from price_inputs import assign_ref_month, ref_month_index, load_daily_er
+from subsidy_formula import load_price_schedule, curr_price_array
+from subsidy_formula import compute_subsidy_kernel
+from consumption_projection import monthly_volume
+from scrape_log import read_checkpoint, update_notice
+
+dt_path =  "<insert your home directory here>"
+
+year = 2022
+eoy_er = 15000 # End-of-year exchange rate projection
+poll_sec = 60 # Seconds between checks of the data directory
+
+series_ls = ['USDIDR'] + mops_ls
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+"""
+The state keeps a running sum and count of every series per reference month
+(indexed as months since Jan 1970), the byte offset already read from
+platts_price.csv and the (date, rate) rows last read from JISDOR.xlsx. New
+daily rows only touch the sums of their own reference month, and only those
+months are re-priced.
+
+JISDOR.xlsx is re-read whole when it changes. Its rate sums are then rebuilt
+from the new file, and the months re-priced are those of the dates added,
+removed or revised since the last read.
+
+The scrapers replace platts_price.csv as a whole (os.replace), and may update
+rows already read. So the offset is only trusted while the bytes before it
+are unchanged: whenever the file's inode or mtime changes, the hash of the
+bytes read so far is checked, and if it differs the MOPS sums are cleared and
+the whole file is read again.
+
+get_platts_price.py also leaves a notice (data/platts_update.json) of the
+reference months its last update touched, asking for a full reload when it
+rewrote rows already stored. The notice is taken and removed on the next
+refresh; those months are re-priced along with the ones read.
+"""
+
+def init_state(dt_path,year=year,regime=default_regime):
+
+    catalog = formula_sets[regime]
+    gastype_ls = list(catalog['gastype'])
+    month = pd.period_range(str(year)+'-01',str(year)+'-12',freq='M')
+
+    # MOPS futures, used for months without any daily MOPS yet (futures month + 1)
+    fut = pd.read_csv(dt_path+'data/platts_price_futures.csv')
+    fut_idx = pd.to_datetime(fut['month']).to_numpy().astype('datetime64[M]').astype('int64') + 1
+
+    return {'catalog':catalog,
+            'month':month,
+            'month_idx':month.to_timestamp().to_numpy().astype('datetime64[M]').astype('int64'),
+            'curr_p':curr_price_array(month,gastype_ls,load_price_schedule(dt_path)),
+            'vol':monthly_volume(dt_path,gastype_ls,year),
+            'fut':dict(zip(fut_idx,fut[mops_ls].to_numpy(dtype='float64'))),
+            'sum':{},'cnt':{},'sub':{},
+            'mops_offset':0,'mops_header':None,
+            'mops_stat':None,'mops_hash':hashlib.sha256(),
+            'er_mtime':None,'er_rows':set(),
+            'last_dt':None}
+
+## Add daily rows (data_dt and any of series_ls) to the running sums
+def add_rows(state,df):
+
+    if df.shape[0] == 0:
+        return set()
+
+    df = assign_ref_month(df,'data_dt')
+    df['ref_idx'] = (df['ref_year']-1970)*12 + df['ref_month']-1
+
+    cols = [x for x in series_ls if x in df.columns]
+    pos = [series_ls.index(x) for x in cols]
+    val = df[cols].to_numpy(dtype='float64')
+    obs = ~np.isnan(val)
+
+    for i in np.unique(df['ref_idx']):
+        rows = (df['ref_idx']==i).to_numpy()
+        state['sum'].setdefault(i,np.zeros(len(series_ls)))
+        state['cnt'].setdefault(i,np.zeros(len(series_ls)))
+        state['sum'][i][pos] += np.where(obs[rows],val[rows],0).sum(axis=0)
+        state['cnt'][i][pos] += obs[rows].sum(axis=0)
+
+    last_dt = df['data_dt'].max()
+    if (state['last_dt'] is None) or (last_dt > state['last_dt']):
+        state['last_dt'] = last_dt
+
+    return set(np.unique(df['ref_idx']).tolist())
+
+## Whether the bytes of platts_price.csv already read are still the same
+def mops_prefix_intact(state,fn):
+
+    st = os.stat(fn)
+    stat = (st.st_ino,st.st_mtime_ns)
+    if stat == state['mops_stat']:
+        return True
+    state['mops_stat'] = stat
+
+    if st.st_size < state['mops_offset']:
+        return False
+    with open(fn,'rb') as f:
+        prefix = f.read(state['mops_offset'])
+    return hashlib.sha256(prefix).digest() == state['mops_hash'].digest()
+
+## Clear the MOPS sums to read platts_price.csv from the start, returns the months cleared
+def reset_mops(state):
+    for i in state['sum']:
+        state['sum'][i][1:] = 0
+        state['cnt'][i][1:] = 0
+    state['mops_offset'], state['mops_header'] = 0, None
+    state['mops_hash'] = hashlib.sha256()
+    return set(state['sum'])
+
+## Read the rows appended to platts_price.csv since the last call (all rows if it was
+## rewritten), and the reference months whose MOPS sums were cleared
+def read_new_mops(state,dt_path):
+
+    fn = dt_path+'data/platts_price.csv'
+    cleared = set()
+    if not mops_prefix_intact(state,fn):
+        cleared = reset_mops(state)
+
+    with open(fn,'rb') as f:
+        f.seek(state['mops_offset'])
+        chunk = f.read()
+
+    # Only complete lines; a partially written last line is read next time
+    chunk = chunk[:chunk.rfind(b'\n')+1]
+    if len(chunk) == 0:
+        return pd.DataFrame(columns=['data_dt']+mops_ls), cleared
+
+    if state['mops_header'] is None:
+        state['mops_header'] = chunk[:chunk.find(b'\n')+1]
+        body = chunk
+    else:
+        body = state['mops_header'] + chunk
+    state['mops_offset'] += len(chunk)
+    state['mops_hash'].update(chunk)
+
+    new = pd.read_csv(io.BytesIO(body))
+    new['data_dt'] = pd.to_datetime(new['data_dt'],errors='coerce')
+    return new, cleared
+
+## Take the scraper's notice, returns the reference months it lists and whether to reload
+def read_update_notice(dt_path):
+    fn = dt_path+update_notice
+    notice = read_checkpoint(fn)
+    if os.path.exists(fn):
+        os.remove(fn)
+    ref_idx = np.array(notice.get('ref_month',[]),dtype='datetime64[M]').astype('int64')
+    return set(ref_idx.tolist()), notice.get('reload',False)
+
+## JISDOR.xlsx cannot be appended to, so re-read it when it changes, rebuild the rate
+## sums and return the reference months of the rows added, removed or revised
+def read_new_er(state,dt_path):
+
+    mtime = os.path.getmtime(dt_path+'data/JISDOR.xlsx')
+    if mtime == state['er_mtime']:
+        return set()
+    state['er_mtime'] = mtime
+
+    er = load_daily_er(dt_path)[['data_dt','USDIDR']]
+    obs = er.dropna(subset=['USDIDR'])
+    rows = set(zip(obs['data_dt'],obs['USDIDR'].astype('float64')))
+    changed = [x[0] for x in rows ^ state['er_rows']]
+    state['er_rows'] = rows
+
+    for i in state['sum']:
+        state['sum'][i][0] = 0
+        state['cnt'][i][0] = 0
+    add_rows(state,er)
+
+    return set(ref_month_index(np.array(changed,dtype='datetime64[D]')).astype('int64').tolist())
+
+## Re-price only the given reference months of the year
+def update_months(state,ref_idx):
+
+    pos = np.where(np.isin(state['month_idx'],list(ref_idx)))[0]
+    if len(pos) == 0:
+        return
+
+    avg = np.full((len(pos),len(series_ls)),np.nan)
+    for k,i in enumerate(state['month_idx'][pos]):
+        if i in state['sum']:
+            cnt = state['cnt'][i]
+            avg[k] = np.where(cnt>0,state['sum'][i]/np.where(cnt>0,cnt,1),np.nan)
+        if np.isnan(avg[k,1:]).all() and (i in state['fut']):
+            avg[k,1:] = state['fut'][i]
+
+    er = np.where(np.isnan(avg[:,0]),eoy_er,avg[:,0])
+    base, retail = evaluate_catalog(avg[:,1:],er,state['catalog'])
+    sub = compute_subsidy_kernel(retail,state['curr_p'][pos],state['vol'])
+
+    for k,i in enumerate(state['month_idx'][pos]):
+        state['sub'][i] = sub[k]
+
+## Nowcast table: subsidy by month, flag of the month in progress, year-to-date total
+def publish(state,dt_path):
+
+    curr = int(ref_month_index(np.datetime64(state['last_dt'],'D')).astype('int64'))
+
+    tot = np.array([state['sub'][i].sum(axis=0) for i in state['month_idx']])
+    res = pd.DataFrame({'month':state['month'].astype(str),
+                        'tot_sub_max':tot[:,0],'tot_sub_min':tot[:,1],
+                        'status':np.where(state['month_idx']<curr,'final',
+                                 np.where(state['month_idx']==curr,'nowcast','projection'))})
+
+    ytd = res.loc[state['month_idx']<=curr,['tot_sub_max','tot_sub_min']].sum()
+    print(res)
+    print('As of '+str(state['last_dt'].date())+', YTD subsidy (billion IDR): max',
+          round(ytd['tot_sub_max'],2),'min',round(ytd['tot_sub_min'],2))
+
+    res.to_csv(dt_path+'data/subsidy_nowcast.csv',index=False)
+    return res
+
+## One refresh: read appended rows and the scraper's notice, update affected months,
+## republish if any
+def refresh(state,dt_path):
+    touched, reload = read_update_notice(dt_path)
+    if reload:
+        touched |= reset_mops(state)
+    touched |= read_new_er(state,dt_path)
+    new, cleared = read_new_mops(state,dt_path)
+    touched |= add_rows(state,new) | cleared
+    if touched:
+        update_months(state,touched)
+        publish(state,dt_path)
+    return touched
+
+## Full read once at start, price every month of the year
+def bootstrap(state,dt_path):
+    read_update_notice(dt_path) # everything is read anyway
+    read_new_er(state,dt_path)
+    add_rows(state,read_new_mops(state,dt_path)[0])
+    update_months(state,state['month_idx'])
+    return publish(state,dt_path)
+
+#############################################################################
+#   2. Run Nowcast
+#############################################################################
+
+if __name__ == '__main__':
+
+    state = init_state(dt_path)
+    bootstrap(state,dt_path)
+
+    while True:
+        time.sleep(poll_sec)
+        refresh(state,dt_path)
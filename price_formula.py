@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Array Kernel for Formula-Based Base and Retail Price
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+import numpy as np
+
+# Define Price Rounding (Up) and Fixed Statutory Subsidy
+
+round_up = 50
+subs_biogasoil = 500
+vat = 0.11 # PPN @ 11%
+fuel_tax = 0.05 # PBBKB @ 5%
+
+rupiah_dtype = 'int32' # Exact dtype of retail and current prices, whole rupiah
+
+bbl_to_ltr = 158.99 # Litre per barrel
+margin = 100/90 # Maximum price includes 10% margin of the base price
+
+# Order of the bound axis in every price array, and of the MOPS series columns
+bound_ls = ['max','min']
+mops_ls = ['mogas_92','mogas_95','gasoil_10','gasoil_500']
+
+#############################################################################
+#   1. Define Price Kernel
+#############################################################################
+
+"""
+The base price is linear in MOPS x USD/IDR, and the maximum price only adds
+the 10% margin on top of the minimum price. Hence both bounds of every
+product and month can be computed in one broadcast pass:
+
+    mops    : (..., month, product) MOPS benchmark of each product, USD/bbl
+    er      : (..., month) USD/IDR exchange rate
+    mult    : (product,) MOPS multiplier (e.g. 0.9921 for RON90)
+    cons    : (product,) Rupiah per litre constant (1800 or 2000)
+    subsidy : (product,) fixed subsidy per litre (only for Biosolar)
+    dist    : (product,) additional distribution cost, share of base price
+
+The remaining parameters are scalars or arrays that broadcast against the
+(..., month, product, bound) output. The arithmetic follows the original
+per-column formula step by step, so the ceil to the rounding step gives the
+same result as the scalar version.
+
+The arithmetic is always float64; retail_dtype and base_dtype only set the
+dtype of the returned arrays. Retail prices are whole multiples of the
+rounding step, so retail_dtype=rupiah_dtype is exact and a quarter of the
+memory of float64, and base_dtype='float32' halves the base price where
+about 7 significant digits are enough. A missing MOPS or ER has no integer
+price, so it raises with an integer retail_dtype; keep float64 to carry NaN.
+"""
+
+def compute_price_kernel(mops,er,mult,cons,subsidy,
+                         rounding=round_up,vat=vat,fuel_tax=fuel_tax,dist=0,
+                         retail_dtype='float64',base_dtype='float64'):
+
+    er = np.asarray(er,dtype='float64')[...,None]
+    subsidy = np.asarray(subsidy,dtype='float64')[...,None]
+
+    min_prc = ((np.asarray(mops,dtype='float64') * mult * er)/bbl_to_ltr + cons)*(1+dist)
+    base = np.stack([min_prc*margin, min_prc],axis=-1)
+
+    retail = rounding * np.ceil((base*(1+vat)-subsidy)*(1+fuel_tax)/rounding)
+
+    # Missing MOPS or ER would otherwise cast to an arbitrary integer
+    if np.dtype(retail_dtype).kind in 'iu' and not np.isfinite(retail).all():
+        raise ValueError("Retail price is not finite (missing MOPS or ER), cannot cast to "+
+                         np.dtype(retail_dtype).name)
+
+    return base.astype(base_dtype,copy=False), retail.astype(retail_dtype,copy=False)
+
+#############################################################################
+#   2. Product Formula Catalog
+#############################################################################
+
+"""
+Each row holds the formula parameters of one gas type: the MOPS benchmark, 
+the Rupiah per litre constant, the MOPS multiplier, the additional 
+distribution cost (share of base price) and whether it carries the fixed 
+statutory subsidy. A formula set is one catalog per regulatory regime:
+
+  - Kepmen ESDM 62 K/12/MEM/2020: MOPS x multiplier + Rp1,800 (below RON95 
+    and CN48) or Rp2,000 (RON95+, CN51+) per litre, plus 10% margin
+  - Permen ESDM 20/2021: Pertalite becomes Jenis BBM Khusus Penugasan, same
+    base price formula. The regulation allows an additional distribution
+    cost for it, but no rate is set in this repository's sources, so dist
+    stays 0 until confirmed
+"""
+
+catalog_dtype = np.dtype([('gastype','U12'),('mops','U12'),('cons','f8'),
+                          ('mult','f8'),('dist','f8'),('fixed_sub','?')])
+
+formula_sets = {
+    'kepmen_62k_2020': np.array([
+        ('pertalite','mogas_92',1800,0.9921,0,False),  # RON90
+        ('pertamax','mogas_92',1800,1,0,False),        # RON92
+        ('turbo','mogas_95',2000,1.01,0,False),        # RON98
+        ('pertadex','gasoil_10',2000,1,0,False),       # Cetane 53, Sulphur 50ppm
+        ('dexlite','gasoil_500',2000,1,0,False),       # Cetane 51, Sulphur 500ppm
+        ('biosolar','gasoil_500',1800,1,0,True),       # Cetane 48, Sulphur 2500ppm
+        ],dtype=catalog_dtype),
+    'permen_20_2021': np.array([
+        ('pertalite','mogas_92',1800,0.9921,0,False),  # dist unconfirmed, see above
+        ('pertamax','mogas_92',1800,1,0,False),
+        ('turbo','mogas_95',2000,1.01,0,False),
+        ('pertadex','gasoil_10',2000,1,0,False),
+        ('dexlite','gasoil_500',2000,1,0,False),
+        ('biosolar','gasoil_500',1800,1,0,True),
+        ],dtype=catalog_dtype),
+    }
+
+default_regime = 'kepmen_62k_2020'
+
+## Stack formula sets into a (regime, product) catalog to compare regimes
+def stack_formula_sets(regime_ls):
+    return np.stack([formula_sets[x] for x in regime_ls])
+
+"""
+Evaluate a catalog of shape (product,) or (regime, product) against MOPS 
+series of shape (..., month, series), ordered as mops_ls. The output has 
+shape (..., month, product, bound), or (..., regime, month, product, bound) 
+for a stacked catalog.
+"""
+
+def evaluate_catalog(mops,er,catalog,subsidy=subs_biogasoil,
+                     rounding=round_up,vat=vat,fuel_tax=fuel_tax,
+                     retail_dtype='float64',base_dtype='float64'):
+
+    col = (catalog['mops'][...,None] == np.array(mops_ls)).argmax(axis=-1)
+    prc = np.take(np.asarray(mops,dtype='float64'),col,axis=-1)
+    er = np.asarray(er,dtype='float64')
+
+    mult, cons, dist = catalog['mult'], catalog['cons'], catalog['dist']
+    sub = catalog['fixed_sub'] * subsidy
+
+    if catalog.ndim == 2:
+        prc = np.moveaxis(prc,-3,-2)
+        er = er[...,None,:]
+        mult, cons, dist, sub = [x[:,None,:] for x in [mult,cons,dist,sub]]
+
+    return compute_price_kernel(prc,er,mult,cons,sub,rounding,vat,fuel_tax,dist,
+                                retail_dtype,base_dtype)
+
+#############################################################################
+#   3. Helper Functions
+#############################################################################
+
+## Flatten (month, product, bound) array into wide columns ordered by bound
+def to_wide(arr,gastype_ls,prefix=''):
+    cols = [prefix+x+'_'+b for b in bound_ls for x in gastype_ls]
+    wide = np.swapaxes(arr,-1,-2).reshape(arr.shape[0],-1)
+    return cols, wide
+
+## Exact integer rupiah of a price array holding whole rupiah (retail, current price)
+def as_rupiah(prc,dtype=rupiah_dtype):
+    prc = np.asarray(prc)
+    assert not np.isnan(prc).any(), "Missing price"
+    out = prc.astype(dtype)
+    assert (out == prc).all(), "Price is not a whole rupiah"
+    return out
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Load and Aggregate Monthly USD/IDR and MOPS Inputs
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+import pandas as pd
+import numpy as np
+
+from price_formula import mops_ls
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+"""
+Statutorily, the exchange rate for the base price calculation for month X
+is the average of the BI exchange rate from the 25th day of (X-2) to the 24th
+day of (X-1). Following functions are used to determine the appropriate month
+for which the data will be used in monthly calculation.
+
+With months counted from Jan 1970 (as datetime64[M] does), a date in month m
+is used for month m+2 if its day is on/after the cutoff day and for month m+1
+otherwise, which needs no special case at year end.
+"""
+
+## Reference month (datetime64[M]) of each date for a given cutoff day
+def ref_month_index(dt,cutoff=25):
+    dt = np.asarray(dt,dtype='datetime64[D]')
+    mo = dt.astype('datetime64[M]')
+    day = (dt - mo.astype('datetime64[D]')).astype('int64') + 1
+    return mo + 1 + (day >= cutoff)
+
+## Rows without a date (blank or unparseable) cannot be placed in a month and are dropped
+def assign_ref_month(df,dt_var,cutoff=25):
+
+    df = df.loc[df[dt_var].notnull()].copy()
+    dt = df[dt_var].to_numpy().astype('datetime64[D]')
+    mo = dt.astype('datetime64[M]').astype('int64')
+    day = (dt - dt.astype('datetime64[M]').astype('datetime64[D]')).astype('int64') + 1
+    ref = ref_month_index(dt,cutoff).astype('int64')
+
+    df['day'] = day
+    df['month'] = mo % 12 + 1
+    df['year'] = mo // 12 + 1970
+    df['ref_month'] = ref % 12 + 1
+    df['ref_year'] = ref // 12 + 1970
+
+    return df
+
+#############################################################################
+#   2. Import USD/IDR Exchange Rate
+#############################################################################
+
+def load_daily_er(dt_path):
+
+    exchg_rt = pd.read_excel(dt_path+"data/JISDOR.xlsx",usecols="B:C",skiprows=4)
+
+    exchg_rt.rename(columns={'Tanggal':'data_dt',
+                             'Kurs':'USDIDR'},inplace=True)
+
+    exchg_rt['data_dt'] = pd.to_datetime(exchg_rt['data_dt'],errors='coerce')
+
+    return assign_ref_month(exchg_rt,'data_dt')
+
+def load_monthly_er(dt_path):
+    exchg_rt = load_daily_er(dt_path)
+    return exchg_rt.groupby(['ref_month','ref_year'])['USDIDR'].mean()
+
+#############################################################################
+#   3. Import Oil Price
+#############################################################################
+
+def load_daily_mops(dt_path):
+    mops = pd.read_csv(dt_path+'data/platts_price.csv')
+    mops['data_dt'] = pd.to_datetime(mops['data_dt'],errors='coerce')
+    return assign_ref_month(mops,'data_dt')
+
+def load_monthly_mops(dt_path):
+
+    # Historical MOPS Price
+    mops = load_daily_mops(dt_path)
+
+    monthly_mops = mops.groupby(['ref_month','ref_year'])[mops_ls].mean()
+    monthly_mops['is_fut'] = False
+
+    # MOPS Price for Post-July Months
+    fut_mops = pd.read_csv(dt_path+'data/platts_price_futures.csv')
+    fut_mo = pd.to_datetime(fut_mops['month']).to_numpy().astype('datetime64[M]')
+
+    # Assign Reference Months for Post-July Months (futures month + 1)
+    ref = fut_mo.astype('int64') + 1
+    fut_mops['ref_month'] = ref % 12 + 1
+    fut_mops['ref_year'] = ref // 12 + 1970
+
+    # Keep future months that are not available in the current data
+    fut_mops.set_index(['ref_month','ref_year'],inplace=True,drop=True)
+    fut_mops = fut_mops[~fut_mops.index.isin(monthly_mops.index)]
+    fut_mops = fut_mops[mops_ls]
+    fut_mops['is_fut'] = True
+
+    # Concatenate data for future months to data for historical months
+    return pd.concat([monthly_mops,fut_mops],axis=0).sort_index()
+
+## Daily USD/IDR and MOPS on a common date index (NaN where not published)
+def load_daily_panel(dt_path):
+    er = load_daily_er(dt_path).groupby('data_dt')['USDIDR'].mean()
+    mops = load_daily_mops(dt_path).groupby('data_dt')[mops_ls].mean()
+    return pd.concat([er,mops],axis=1).sort_index()[['USDIDR']+mops_ls]
+
+#############################################################################
+#   4. Combine Monthly Variables
+#############################################################################
+
+"""
+Monthly panel of MOPS and USD/IDR for the given year, one row per reference
+month. USDIDR is left as NaN for months without BI data, to be filled by the
+end-of-year projection of each scenario; is_fut flags months priced off the
+futures curve.
+"""
+
+def load_price_panel(dt_path,year=2022):
+
+    monthly_er = load_monthly_er(dt_path)
+    monthly_mops = load_monthly_mops(dt_path)
+
+    price_df = pd.merge(monthly_mops,monthly_er,how='outer',
+                         left_index=True,right_index=True).reset_index()
+
+    # Add Month Variable
+    price_df['month'] = pd.to_datetime(price_df['ref_year'].astype(int).astype(str) + '-' +
+                                       price_df['ref_month'].astype(int).astype(str) + '-1',
+                                       format = '%Y-%m').dt.to_period('M')
+    price_df = price_df.sort_values(['month'])
+
+    # Keep for Selected Year Only
+    price_df = price_df.loc[price_df['ref_year']==year].reset_index(drop=True)
+    price_df['is_fut'] = price_df['is_fut'].fillna(False).astype(bool)
+
+    return price_df
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Retail Price Adjustment Schedule that Minimizes Subsidy under Price-Jump Limits
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+import pandas as pd
+import numpy as np
+
+from price_formula import round_up, mops_ls, bound_ls, formula_sets, default_regime
+from price_formula import evaluate_catalog
+from price_inputs import load_price_panel
+from subsidy_formula import load_price_schedule, build_schedule_index, lookup_price
+from subsidy_formula import curr_price_array, compute_subsidy_kernel
+from consumption_projection import monthly_volume
+
+dt_path =  "<insert your home directory here>"
+
+eoy_er = 15000 # End-of-year exchange rate projection
+policy_ls = ['pertalite','biosolar','pertamax'] # Administered prices to optimize
+max_jump = 3500 # Largest increase in one change, IDR per litre
+max_change = 2 # Largest number of changes in the year
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+"""
+A schedule sets the current retail price of each month; a change takes effect
+for the whole month. Candidate schedules of shape (..., candidate, month,
+product) are evaluated against the formula prices in one call of the subsidy
+kernel.
+
+The optimal schedule is found by dynamic programming over months. The state
+is the price level (the starting price plus a multiple of the rounding step,
+up to the highest formula price) and the number of changes used; a month
+either keeps the price or raises it by at most max_jump at the cost of one
+change. With n levels, K changes and 12 months this is 12 x n^2 x K steps
+instead of enumerating every schedule, vectorized over products and bounds.
+Ties go to the lower price level.
+"""
+
+## Subsidy (billion IDR) of candidate schedules, (..., candidate, month, product, bound)
+def evaluate_schedules(retail,sched,vol):
+    return compute_subsidy_kernel(retail,sched,vol)
+
+## Subsidy of each month at each price level, (product, bound, month, level)
+def level_cost(retail,level,vol):
+    unit = np.maximum(np.moveaxis(retail,0,-1)[...,None] - level[:,None,None,:],0)
+    return unit * np.asarray(vol)[:,None,None,None] / (10**9)
+
+def optimize_schedule(retail,start_p,vol,max_jump=max_jump,max_change=max_change,
+                      step=round_up,allow_cut=False):
+
+    # Price levels of each product, start price plus multiples of step
+    n_lv = int(np.ceil((retail.max() - np.min(start_p))/step)) + 1
+    level = np.asarray(start_p,dtype='float64')[:,None] + step*np.arange(n_lv)
+    cost = level_cost(retail,level,vol)                       # (product, bound, month, level)
+
+    d = (np.arange(n_lv)[None,:] - np.arange(n_lv)[:,None])*step # (from, to)
+    allowed = (d <= max_jump) & ((d > 0) | (allow_cut & (d < 0) & (-d <= max_jump)))
+
+    n_mo, n_c = cost.shape[2], max_change+1
+    val = np.full(cost.shape[:2]+(n_lv,n_c),np.inf)
+    val[...,0,0] = 0
+    from_lv = np.zeros((n_mo,)+val.shape,dtype='int32')
+    from_c = np.zeros((n_mo,)+val.shape,dtype='int8')
+
+    for m in range(n_mo):
+        jump = np.where(allowed[:,:,None],val[...,:,None,:-1],np.inf) # (..., from, to, c)
+        arg = jump.argmin(axis=-3)
+        jump = np.take_along_axis(jump,arg[...,None,:,:],axis=-3)[...,0,:,:]
+
+        stay = val[...,1:] <= jump
+        from_lv[m] = np.arange(n_lv)[:,None]
+        from_lv[m][...,1:] = np.where(stay,np.arange(n_lv)[:,None],arg)
+        from_c[m] = np.arange(n_c)
+        from_c[m][...,1:] = np.where(stay,np.arange(1,n_c),np.arange(n_c-1))
+        val = np.concatenate([val[...,:1],np.minimum(val[...,1:],jump)],axis=-1)
+        val = val + cost[...,m,:,None]
+
+    # Backtrack from the cheapest final state
+    flat = val.reshape(val.shape[:2]+(-1,)).argmin(axis=-1)
+    lv, c = np.unravel_index(flat,(n_lv,n_c))
+    path = np.zeros((n_mo,)+lv.shape,dtype='int64')
+    for m in range(n_mo-1,-1,-1):
+        path[m] = lv
+        idx = (np.arange(lv.shape[0])[:,None],np.arange(lv.shape[1])[None,:],lv,c)
+        lv, c = from_lv[m][idx], from_c[m][idx]
+
+    # Schedule (month, product, bound) and its total subsidy (product, bound)
+    sched = np.take_along_axis(level[:,None,:],np.moveaxis(path,0,-1),axis=-1)
+    return np.moveaxis(sched,-1,0), val.min(axis=(-2,-1))
+
+## Check: no random feasible schedule (increases only) beats the optimum total
+def check_schedule(retail,start_p,vol,tot,max_jump=max_jump,max_change=max_change,
+                   step=round_up,n_cand=5000,seed=0):
+    rng = np.random.default_rng(seed)
+    n_mo, n_p = retail.shape[0], retail.shape[1]
+    when = np.sort(rng.integers(0,n_mo,(n_cand,n_p,max_change)),axis=-1)
+    size = rng.integers(0,max_jump//step+1,(n_cand,n_p,max_change))*step
+    rise = (np.arange(n_mo)[None,:,None,None] >= when[:,None]) * size[:,None]
+    cand = start_p + rise.sum(axis=-1)
+    cand_tot = evaluate_schedules(retail,cand,vol).sum(axis=1)
+    if not (cand_tot.min(axis=0) >= tot - 1e-6).all():
+        raise ValueError("A candidate schedule beats the optimum")
+
+#############################################################################
+#   2. Optimize the 2022 Schedule of Administered Prices
+#############################################################################
+
+if __name__ == '__main__':
+
+    price_df = load_price_panel(dt_path)
+    price_df.loc[price_df['USDIDR'].isnull(),'USDIDR'] = eoy_er
+
+    catalog = formula_sets[default_regime]
+    catalog = catalog[np.isin(catalog['gastype'],policy_ls)]
+    gastype_ls = list(catalog['gastype'])
+
+    base, retail = evaluate_catalog(price_df[mops_ls].to_numpy(),price_df['USDIDR'].to_numpy(),catalog)
+    vol = monthly_volume(dt_path,gastype_ls)
+
+    sched_df = load_price_schedule(dt_path)
+    actual = curr_price_array(price_df['month'],gastype_ls,sched_df)
+    start_p = lookup_price(build_schedule_index(sched_df,gastype_ls),['2021-12-31'])[0]
+
+    sched, tot = optimize_schedule(retail,start_p,vol)
+
+    act_tot = evaluate_schedules(retail,actual,vol).sum(axis=0)
+    print(pd.DataFrame({'actual_'+b:act_tot[:,i] for i,b in enumerate(bound_ls)} |
+                       {'optimal_'+b:tot[:,i] for i,b in enumerate(bound_ls)},index=gastype_ls))
+    for i,b in enumerate(bound_ls):
+        print('Optimal schedule,',b,'bound')
+        print(pd.DataFrame(sched[:,:,i],index=price_df['month'].astype(str),columns=gastype_ls))
+
+    check_schedule(retail,start_p,vol,tot)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Precomputed Step Index of Retail Price in MOPS x USD/IDR
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+import time
+
+import numpy as np
+
+from price_formula import round_up, subs_biogasoil, vat, fuel_tax, mops_ls, bound_ls
+from price_formula import bbl_to_ltr, margin, formula_sets, default_regime, evaluate_catalog
+
+dt_path =  "<insert your home directory here>"
+
+mops_max = 300 # Highest MOPS covered by the index, USD per barrel
+er_max = 30000 # Highest USD/IDR covered by the index
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+"""
+For a product, the retail price depends on MOPS and USD/IDR only through
+u = MOPS x mult x ER, computed in that order as in the price kernel, and is a
+non-decreasing step function of u. The index holds, for each product and
+bound, the largest u at which the retail price is still k x rounding, for
+every step k from u = 0 to the top of the covered range.
+
+The boundaries start from the exact inversion of the ceil (as in
+break_even.py) and are then moved by single floating-point steps until the
+forward formula agrees, so a lookup is a binary search that returns exactly
+the price the kernel would.
+"""
+
+## Retail price of each step boundary candidate, same operation order as the kernel
+def step_retail(u,cons,dist,mg,sub,rounding=round_up,vat=vat,fuel_tax=fuel_tax):
+    min_prc = (u/bbl_to_ltr + cons)*(1+dist)
+    return rounding * np.ceil((min_prc*mg*(1+vat)-sub)*(1+fuel_tax)/rounding)
+
+def build_price_surface(catalog,subsidy=subs_biogasoil,rounding=round_up,vat=vat,
+                        fuel_tax=fuel_tax,mops_max=mops_max,er_max=er_max):
+
+    # Parameters as (product, bound, 1), bound ordered as bound_ls
+    cons, dist = catalog['cons'][:,None,None], catalog['dist'][:,None,None]
+    sub = (catalog['fixed_sub']*subsidy)[:,None,None]
+    mg = np.array([margin,1.0])[None,:,None]
+    f = lambda u: step_retail(u,cons,dist,mg,sub,rounding,vat,fuel_tax)
+
+    u_max = mops_max*catalog['mult'].max()*er_max
+    k_lo = (f(np.zeros((1,1,1)))/rounding).astype('int64')
+    k_hi = (f(np.full((1,1,1),u_max))/rounding).astype('int64')
+    k = k_lo + np.arange((k_hi-k_lo).max()+1)
+
+    # Exact inversion of ceil, then snap to the floating-point boundary
+    base_k = (k*rounding/(1+fuel_tax) + sub)/(1+vat)
+    q = np.maximum((base_k/(mg*(1+dist)) - cons)*bbl_to_ltr,0)
+    for i in range(64):
+        over = f(q) > k*rounding
+        under = ~over & (f(np.nextafter(q,np.inf)) <= k*rounding)
+        if not (over.any() or under.any()):
+            break
+        q = np.where(over,np.nextafter(q,-np.inf),np.where(under,np.nextafter(q,np.inf),q))
+
+    col = (catalog['mops'][:,None] == np.array(mops_ls)).argmax(axis=-1)
+    return {'k0':k_lo[...,0],'bound':q,'rounding':rounding,'col':col,
+            'mult':catalog['mult'],'gastype':catalog['gastype']}
+
+def save_price_surface(fn,index):
+    np.savez_compressed(fn,**index)
+
+def load_price_surface(fn):
+    with np.load(fn) as f:
+        return {x:(f[x].item() if f[x].ndim == 0 else f[x]) for x in f.files}
+
+## Retail price from MOPS (..., series) and USD/IDR (...), (..., product, bound)
+def lookup_retail(index,mops,er):
+    u = np.take(np.asarray(mops,dtype='float64'),index['col'],axis=-1) * index['mult'] \
+        * np.asarray(er,dtype='float64')[...,None]
+    n_p, n_b = index['k0'].shape
+    pos = np.empty(u.shape+(n_b,),dtype='int64')
+    for p in range(n_p):
+        for b in range(n_b):
+            pos[...,p,b] = np.searchsorted(index['bound'][p,b],u[...,p])
+    return (index['k0'] + pos)*index['rounding']
+
+## Unit subsidy given the current price (..., product), (..., product, bound)
+def lookup_unit_subsidy(index,mops,er,curr_p):
+    return np.maximum(lookup_retail(index,mops,er) - np.asarray(curr_p)[...,None],0)
+
+## Check: the lookup reproduces the kernel at the given MOPS (..., series) and ER (...)
+def check_price_surface(index,catalog,mops,er):
+    base, retail = evaluate_catalog(mops,er,catalog)
+    if not (lookup_retail(index,mops,er) == retail).all():
+        raise ValueError("Index and kernel disagree")
+
+#############################################################################
+#   2. Build the Index for the Current Formula Set
+#############################################################################
+
+if __name__ == '__main__':
+
+    catalog = formula_sets[default_regime]
+    index = build_price_surface(catalog)
+    save_price_surface(dt_path+'data/price_surface.npz',index)
+    print('Steps per product and bound:',index['bound'].shape[-1])
+
+    # Check: the lookup reproduces the kernel on random draws
+    rng = np.random.default_rng(0)
+    mops = rng.uniform(20,mops_max,(200000,len(mops_ls)))
+    er = rng.uniform(8000,er_max,200000)
+    check_price_surface(index,catalog,mops,er)
+
+    # Single (MOPS, ER) query
+    index = load_price_surface(dt_path+'data/price_surface.npz')
+    t0 = time.perf_counter()
+    for i in range(1000):
+        lookup_retail(index,mops[i],er[i])
+    print('Microseconds per query:',round((time.perf_counter()-t0)*1000,1))
+    print(dict(zip(index['gastype'],lookup_retail(index,[110,120,130,135],15000)[:,bound_ls.index('min')])))
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Province-Level Retail Price and Subsidy by Product and Month
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+import pandas as pd
+import numpy as np
+
+from price_formula import mops_ls, bound_ls, formula_sets, default_regime, evaluate_catalog
+from price_formula import rupiah_dtype, as_rupiah
+from price_inputs import load_price_panel
+from subsidy_formula import load_price_schedule, curr_price_array
+from subsidy_formula import compute_subsidy_kernel
+from consumption_projection import monthly_volume
+
+dt_path =  "<insert your home directory here>"
+
+eoy_er_ls = [15000, 15750] # Baseline and 5% depreciation scenario
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+"""
+Province parameters (data/province_params.csv), one row per province:
+
+  - fuel_tax  : PBBKB rate of the province, set by each Perda (5% where the
+                national assumption applies)
+  - price_adj : current retail price of the province less the Jakarta price
+                of the schedule, Rupiah per litre
+  - pop_2020  : population, Sensus Penduduk 2020, used as the proxy of the
+                province share of national volume
+
+Only the PBBKB step depends on the province, so the base price keeps its
+(..., month, product, bound) shape and the region axis enters right before
+the month axis of the retail price and subsidy: (..., region, month, product,
+bound). Retail and current prices are kept as integer rupiah and the subsidy
+as float32, which halves the memory of a 34-province scenario grid.
+"""
+
+region_dtype = np.dtype([('province','U32'),('fuel_tax','f4'),
+                         ('price_adj','f4'),('vol_share','f4')])
+
+def load_region_table(dt_path):
+    prov = pd.read_csv(dt_path+'data/province_params.csv')
+    region = np.zeros(prov.shape[0],dtype=region_dtype)
+    region['province'] = prov['province']
+    region['fuel_tax'] = prov['fuel_tax']
+    region['price_adj'] = prov['price_adj']
+    region['vol_share'] = prov['pop_2020']/prov['pop_2020'].sum()
+    return region
+
+## Base and retail price by region; base (..., month, product, bound),
+## retail (..., region, month, product, bound) as integer rupiah
+def evaluate_region(mops,er,catalog,region,**kwargs):
+    fuel_tax = region['fuel_tax'].astype('float64').reshape(-1,1,1,1)
+    base, retail = evaluate_catalog(np.asarray(mops,dtype='float64')[...,None,:,:],
+                                    np.asarray(er,dtype='float64')[...,None,:],
+                                    catalog,fuel_tax=fuel_tax,retail_dtype=rupiah_dtype,**kwargs)
+    return base[...,0,:,:,:], retail
+
+## Current price by region, (region, month, product)
+def regional_curr_price(curr_p,region):
+    return as_rupiah(curr_p[None,:,:] + region['price_adj'][:,None,None])
+
+## Volume by region, (region, 1, product); share is (region,) or (region, product)
+def regional_volume(vol,share):
+    share = np.asarray(share,dtype='float32')
+    if share.ndim == 1:
+        share = share[:,None]
+    return (share * np.asarray(vol,dtype='float32'))[:,None,:]
+
+## Subsidy (billion IDR), (..., region, month, product, bound)
+def regional_subsidy(retail,curr_p_r,vol_r):
+    return compute_subsidy_kernel(retail,curr_p_r,vol_r).astype('float32')
+
+#############################################################################
+#   2. Compute Subsidy by Province, Baseline and Depreciation Scenario
+#############################################################################
+
+if __name__ == '__main__':
+
+    price_df = load_price_panel(dt_path)
+    catalog = formula_sets[default_regime]
+    gastype_ls = list(catalog['gastype'])
+    region = load_region_table(dt_path)
+
+    # Stack both ER scenarios and price them in one pass
+    er = np.tile(price_df['USDIDR'].to_numpy(),(len(eoy_er_ls),1))
+    er = np.where(np.isnan(er),np.array(eoy_er_ls)[:,None],er)
+    base, retail = evaluate_region(price_df[mops_ls].to_numpy(),er,catalog,region)
+
+    curr_p = regional_curr_price(curr_price_array(price_df['month'],gastype_ls,
+                                                  load_price_schedule(dt_path)),region)
+    vol = regional_volume(monthly_volume(dt_path,gastype_ls),region['vol_share'])
+
+    sub = regional_subsidy(retail,curr_p,vol)
+
+    # Annualized Subsidy by Province (Stated in Billion IDR)
+    tot = sub.sum(axis=(-3,-2),dtype='float64')
+    res = pd.concat({x:pd.DataFrame(tot[k],index=region['province'],
+                                    columns=['tot_sub_'+b for b in bound_ls])
+                     for k,x in enumerate(eoy_er_ls)},axis=1)
+    print(res)
+    print(res.sum())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Long-Format Parquet Store of Price and Subsidy Results
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from price_formula import bound_ls
+
+store_dir = 'data/result_store/'
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+"""
+Results are kept as one Parquet dataset per table (e.g. 'price', 'subsidy')
+under data/result_store/<table>/scenario=<name>/year=<yyyy>/, one row per
+(month, product, bound) and one column per measure. Month is a date (first
+day of month), gastype and bound are dictionary-encoded and retail prices are
+integer rupiah, so no text is parsed on read. Filters on scenario and year
+only open the matching partitions, filters on other columns are pushed down
+to the row groups, and only the requested columns are read.
+
+The store is generated output: compute_baseline_price.py and
+compute_price_depreciation_scenario.py write the 'price' table, and it is
+not tracked in git.
+"""
+
+## Long Arrow table of (month, product, bound) arrays, one column per measure
+def to_long_table(scenario,month,gastype_ls,**measures):
+
+    mo = np.asarray(pd.PeriodIndex(month,freq='M').astype(str),dtype='datetime64[M]')
+    n_mo, n_p, n_b = len(mo), len(gastype_ls), len(bound_ls)
+    n = n_mo*n_p*n_b
+
+    cols = {'scenario':pa.array(np.repeat(scenario,n)),
+            'year':pa.array((mo.astype('int64')//12 + 1970).repeat(n_p*n_b).astype('int16')),
+            'month':pa.array(mo.astype('datetime64[D]').repeat(n_p*n_b)),
+            'gastype':pa.DictionaryArray.from_arrays(
+                pa.array(np.tile(np.arange(n_p,dtype='int8').repeat(n_b),n_mo)),
+                pa.array(list(gastype_ls))),
+            'bound':pa.DictionaryArray.from_arrays(
+                pa.array(np.tile(np.arange(n_b,dtype='int8'),n_mo*n_p)),pa.array(bound_ls))}
+
+    for x,arr in measures.items():
+        assert arr.shape == (n_mo,n_p,n_b), x+" is not (month, product, bound)"
+        cols[x] = pa.array(np.ascontiguousarray(arr).ravel())
+
+    return pa.table(cols)
+
+## Write (month, product, bound) arrays of one scenario, replacing its partitions
+def write_results(dt_path,table,scenario,month,gastype_ls,**measures):
+    tbl = to_long_table(scenario,month,gastype_ls,**measures)
+    pq.write_to_dataset(tbl,dt_path+store_dir+table,partition_cols=['scenario','year'],
+                        existing_data_behavior='delete_matching',
+                        basename_template='part-{i}.parquet')
+
+## Read a table, e.g. filters=[('scenario','in',['baseline']),('gastype','=','pertamax')]
+def read_results(dt_path,table,columns=None,filters=None):
+    tbl = pq.read_table(dt_path+store_dir+table,columns=columns,filters=filters,
+                        partitioning='hive')
+    df = tbl.to_pandas(date_as_object=False)
+    if 'month' in df.columns:
+        df['month'] = df['month'].dt.to_period('M')
+    return df
+
+## Long rows back to an array of shape (scenario, month, product, bound); an
+## integer dtype (e.g. rupiah_dtype for prices) requires every cell to be present
+def long_to_array(df,measure,scenario_ls,gastype_ls,dtype='float64'):
+
+    month = pd.PeriodIndex(np.sort(df['month'].unique()),freq='M')
+    s = pd.Categorical(df['scenario'],categories=scenario_ls).codes
+    p = pd.Categorical(df['gastype'],categories=gastype_ls).codes
+    b = pd.Categorical(df['bound'],categories=bound_ls).codes
+    m = month.searchsorted(df['month'])
+    keep = (s >= 0) & (p >= 0)
+
+    shape = (len(scenario_ls),len(month),len(gastype_ls),len(bound_ls))
+    if np.issubdtype(dtype,np.integer):
+        assert keep.sum() == np.prod(shape), "Missing rows for an integer "+measure
+        arr = np.zeros(shape,dtype=dtype)
+    else:
+        arr = np.full(shape,np.nan,dtype=dtype)
+    arr[s[keep],m[keep],p[keep],b[keep]] = df[measure].to_numpy(dtype=dtype)[keep]
+
+    return arr, month
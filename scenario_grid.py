@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Evaluate Formula-Based Retail Price over a Grid of Scenarios
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+from multiprocessing import get_context
+
+import numpy as np
+
+from price_formula import round_up, subs_biogasoil, vat, fuel_tax, mops_ls
+from price_formula import bound_ls, formula_sets, default_regime, evaluate_catalog
+from price_formula import rupiah_dtype
+from price_inputs import load_price_panel
+
+dt_path =  "<insert your home directory here>"
+
+# Scenario parameters and their default (baseline) values
+grid_default = {'eoy_er':15000, # End-of-year exchange rate projection
+                'vat':vat,
+                'fuel_tax':fuel_tax,
+                'subs_biogasoil':subs_biogasoil,
+                'round_up':round_up,
+                'mops_shock':0} # Relative shock to futures-based MOPS
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+## Cartesian grid of scenario parameters, flattened to one array per parameter
+def build_grid(**axes):
+    vals = [np.atleast_1d(np.asarray(axes.get(x,grid_default[x]),dtype='float64'))
+            for x in grid_default]
+    mesh = np.meshgrid(*vals,indexing='ij')
+    return {x:m.ravel() for x,m in zip(grid_default,mesh)}
+
+def grid_size(grid):
+    return len(grid['eoy_er'])
+
+def slice_grid(grid,start,stop):
+    return {x:v[start:stop] for x,v in grid.items()}
+
+"""
+Evaluate every scenario of the grid against the monthly panel in one pass.
+
+    mops   : (month, series) monthly MOPS, ordered as mops_ls
+    er     : (month,) monthly USD/IDR, NaN where the EOY projection applies
+    is_fut : (month,) True for months priced off the futures curve; the MOPS
+             shock only applies to these months
+
+Returns base and retail price of shape (scenario, month, product, bound),
+as base_dtype and retail_dtype (see price_formula.compute_price_kernel).
+"""
+
+def evaluate_grid(mops,er,is_fut,grid,catalog,retail_dtype='float64',base_dtype='float64'):
+
+    col = lambda x: grid[x].reshape(-1,1,1,1)
+
+    er_s = np.where(np.isnan(er),grid['eoy_er'][:,None],er)
+    mops_s = mops * (1 + grid['mops_shock'][:,None,None] * is_fut[:,None])
+
+    return evaluate_catalog(mops_s,er_s,catalog,
+                            subsidy=grid['subs_biogasoil'].reshape(-1,1,1),
+                            rounding=col('round_up'),vat=col('vat'),
+                            fuel_tax=col('fuel_tax'),
+                            retail_dtype=retail_dtype,base_dtype=base_dtype)
+
+def eval_chunk(args):
+    return evaluate_grid(*args)
+
+## Split the grid into chunks and spread them across a process pool
+def run_grid(price_df,grid,catalog,chunk_size=5000,processes=None,
+             retail_dtype='float64',base_dtype='float64'):
+
+    mops = price_df[mops_ls].to_numpy(dtype='float64')
+    er = price_df['USDIDR'].to_numpy(dtype='float64')
+    is_fut = price_df['is_fut'].to_numpy(dtype='bool')
+
+    n = grid_size(grid)
+    chunks = [(mops,er,is_fut,slice_grid(grid,i,i+chunk_size),catalog,retail_dtype,base_dtype)
+              for i in range(0,n,chunk_size)]
+
+    if processes == 1 or len(chunks) == 1:
+        res = [eval_chunk(x) for x in chunks]
+    else:
+        with get_context("spawn").Pool(processes=processes) as p:
+            res = p.map(eval_chunk,chunks)
+
+    base = np.concatenate([x[0] for x in res],axis=0)
+    retail = np.concatenate([x[1] for x in res],axis=0)
+
+    return base, retail
+
+#############################################################################
+#   2. Run Scenario Grid
+#############################################################################
+
+if __name__ == '__main__':
+
+    # Load and aggregate the inputs once
+    price_df = load_price_panel(dt_path)
+    catalog = formula_sets[default_regime]
+
+    grid = build_grid(eoy_er=np.arange(14000,17001,50),
+                      vat=[0.10,0.11,0.12],
+                      fuel_tax=[0.05,0.075,0.10],
+                      subs_biogasoil=[500,1000],
+                      mops_shock=np.linspace(-0.3,0.3,25))
+
+    # Whole-rupiah retail price and single-precision base price
+    base, retail = run_grid(price_df,grid,catalog,
+                            retail_dtype=rupiah_dtype,base_dtype='float32')
+
+    # Stacked scenario x month x product x bound result
+    np.savez_compressed(dt_path+'data/scenario_grid.npz',
+                        base=base,retail=retail,
+                        month=price_df['month'].astype(str).to_numpy(),
+                        gastype=catalog['gastype'],bound=np.array(bound_ls),
+                        **{'grid_'+x:v for x,v in grid.items()})
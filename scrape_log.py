@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: On-Disk Row Log and Checkpoints for the Platts Scrapers, with Atomic Merge
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+import csv
+import io
+import json
+import os
+import shutil
+import threading
+
+import pandas as pd
+
+log_dir = 'data/scrape_log/'
+update_notice = 'data/platts_update.json' # Months to recompute, read by nowcast_subsidy.py
+
+write_lock = threading.Lock() # Scrape tasks of one symbol may share a log
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+"""
+Each scraper keeps, per symbol, a CSV log under data/scrape_log/<scraper>/
+to which rows are appended (and flushed to disk) as soon as they are read,
+and a JSON checkpoint of where the scrape stands. A row counts only once its
+newline is on disk; a torn last line from a crash is cut off when the log is
+read back. A rerun reads the log and checkpoint and carries on from there.
+
+At the end, the logged rows are merged into the output CSV: rows of dates
+already in the file are updated in place, new dates are appended, and the
+file is replaced atomically. The logs are then removed.
+
+Values are kept as the text read from the page, so merging does not change
+the formatting of rows already stored.
+"""
+
+def log_file(dt_path,name,key):
+    return dt_path+log_dir+name+'/'+key+'.csv'
+
+def checkpoint_file(dt_path,name,key):
+    return dt_path+log_dir+name+'/'+key+'.json'
+
+## Rows already logged, {first field: remaining fields}, cutting off a torn last line
+def read_log(fn):
+    if not os.path.exists(fn):
+        return {}
+    with open(fn,'r+',newline='') as f:
+        txt = f.read()
+        end = txt.rfind('\n') + 1
+        if end < len(txt):
+            f.seek(end)
+            f.truncate()
+    return {row[0]:row[1:] for row in csv.reader(io.StringIO(txt[:end])) if len(row) > 1}
+
+## Append rows and flush them to disk
+def append_log(fn,rows):
+    os.makedirs(os.path.dirname(fn),exist_ok=True)
+    with write_lock, open(fn,'a',newline='') as f:
+        csv.writer(f,lineterminator='\n').writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+
+def read_checkpoint(fn):
+    if not os.path.exists(fn):
+        return {}
+    with open(fn) as f:
+        return json.load(f)
+
+def write_checkpoint(fn,ckpt):
+    os.makedirs(os.path.dirname(fn),exist_ok=True)
+    with open(fn+'.tmp','w') as f:
+        json.dump(ckpt,f)
+    os.replace(fn+'.tmp',fn)
+
+## Write a frame to CSV through a temporary file, so readers never see a partial file
+def write_csv_atomic(df,fn,**kwargs):
+    df.to_csv(fn+'.tmp',**kwargs)
+    os.replace(fn+'.tmp',fn)
+
+## Update rows of dates already in the CSV in place and append new dates at the end
+def merge_csv(fn,new_df):
+    if os.path.exists(fn):
+        old_df = pd.read_csv(fn,dtype=str).set_index(new_df.index.name)
+    else:
+        old_df = pd.DataFrame(columns=new_df.columns,index=pd.Index([],name=new_df.index.name))
+    new_df = new_df.astype(str).where(new_df.notnull())
+    new_df.index = new_df.index.astype(str)
+
+    df = old_df.reindex(columns=old_df.columns.union(new_df.columns,sort=False))
+    df = df.reindex(df.index.append(new_df.index.difference(df.index,sort=False)))
+    df.update(new_df)
+    write_csv_atomic(df,fn)
+    return df
+
+def clear_logs(dt_path,name):
+    shutil.rmtree(dt_path+log_dir+name,ignore_errors=True)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Shapley Attribution of Subsidy Changes to ER, MOPS, Volume and Retail Price
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+from math import factorial
+
+import pandas as pd
+import numpy as np
+
+from price_formula import mops_ls, bound_ls, formula_sets, default_regime, evaluate_catalog
+from price_inputs import load_price_panel
+from subsidy_formula import load_price_schedule, curr_price_array, compute_subsidy_kernel
+from consumption_projection import monthly_volume
+from subsidy_plot import waterfall_plot_subsidy
+
+dt_path =  "<insert your home directory here>"
+
+eoy_er = 15000 # End-of-year exchange rate projection
+
+# Drivers of the subsidy, and their labels
+driver_ls = ['er','mops','vol','curr_p']
+driver_name = {'er':'USD/IDR','mops':'MOPS','vol':'Volume','curr_p':'Retail Price'}
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+"""
+The change in subsidy from a reference state a to a target state b is split
+over the k drivers by their Shapley values,
+
+    phi_i = sum over S not holding i of |S|!(k-|S|-1)!/k! x (v(S+i) - v(S))
+
+where v(S) is the subsidy with the drivers in S at b and the rest at a. The
+2^k coalitions are stacked on a leading axis (bit i of coalition c set means
+driver i is at b), so the whole set is one evaluation of the price and
+subsidy kernel. The contributions add up exactly to v(all) - v(none).
+
+Each state is a dict of the drivers:
+
+    er     : (month,) USD/IDR
+    mops   : (month, series) MOPS, ordered as mops_ls
+    vol    : (product,) or (month, product) monthly volume, litre
+    curr_p : (month, product) current retail price
+"""
+
+## Coalition masks, (2^k, k)
+def coalition_mask(k):
+    return ((np.arange(2**k)[:,None] >> np.arange(k)) & 1).astype(bool)
+
+## Weight of a coalition of each size not holding the driver, (k,)
+def shapley_weight(k):
+    return np.array([factorial(s)*factorial(k-s-1)/factorial(k) for s in range(k)])
+
+## Inputs of every coalition, each driver with a leading (2^k,) axis
+def stack_coalitions(a,b,mask):
+    shape = {'vol':np.shape(a['curr_p'])}
+    res = {}
+    for i,x in enumerate(driver_ls):
+        xa, xb = np.broadcast_arrays(*[np.broadcast_to(y,shape.get(x,np.shape(y)))
+                                       for y in (a[x],b[x])])
+        pick = mask[:,i].reshape((-1,)+(1,)*xa.ndim)
+        res[x] = np.where(pick,xb,xa)
+    return res
+
+## Subsidy at a and b and the contribution of each driver, (driver, month, product, bound)
+def shapley_subsidy(a,b,catalog,**kwargs):
+
+    k = len(driver_ls)
+    mask = coalition_mask(k)
+    x = stack_coalitions(a,b,mask)
+
+    base, retail = evaluate_catalog(x['mops'],x['er'],catalog,**kwargs)
+    sub = compute_subsidy_kernel(retail,x['curr_p'],x['vol'])
+
+    c = np.arange(2**k)
+    w = shapley_weight(k)
+    phi = np.zeros((k,)+sub.shape[1:])
+    for i in range(k):
+        s = c[~mask[:,i]]
+        phi[i] = np.tensordot(w[mask[s].sum(axis=1)],sub[s | (1<<i)] - sub[s],axes=1)
+
+    return {'start':sub[0],'end':sub[-1],'phi':phi}
+
+## Long table by month, product and bound: start, contribution of each driver, end
+def attribution_table(res,month,gastype_ls):
+    idx = pd.MultiIndex.from_product([month,gastype_ls,bound_ls],
+                                     names=['month','gastype','bound'])
+    cols = {'start':res['start'].ravel()}
+    cols.update({x:res['phi'][i].ravel() for i,x in enumerate(driver_ls)})
+    cols['end'] = res['end'].ravel()
+    return pd.DataFrame(cols,index=idx)
+
+## Waterfall input for one bound: start, drivers and end total (IDR trillion)
+def waterfall_series(res,bound='min',scale=1000):
+    b = bound_ls.index(bound)
+    tot = [res['start'][...,b].sum()] + [res['phi'][i][...,b].sum() for i in range(len(driver_ls))]
+    tot = pd.Series(tot + [res['end'][...,b].sum()],
+                    index=['Reference']+[driver_name[x] for x in driver_ls]+['Total'])
+    return round(tot/scale,2)
+
+#############################################################################
+#   2. Attribute the 2022 Subsidy Relative to January Conditions
+#############################################################################
+
+"""
+Reference: every month of 2022 priced at the January USD/IDR, MOPS and current
+retail price, with 2021 volume. Target: the actual monthly path, with the
+2022 volume projection.
+"""
+
+if __name__ == '__main__':
+
+    price_df = load_price_panel(dt_path)
+    price_df.loc[price_df['USDIDR'].isnull(),'USDIDR'] = eoy_er
+
+    catalog = formula_sets[default_regime]
+    gastype_ls = list(catalog['gastype'])
+
+    target = {'er':price_df['USDIDR'].to_numpy(),
+              'mops':price_df[mops_ls].to_numpy(),
+              'vol':monthly_volume(dt_path,gastype_ls,2022),
+              'curr_p':curr_price_array(price_df['month'],gastype_ls,
+                                        load_price_schedule(dt_path))}
+    ref = {'er':np.repeat(target['er'][:1],12,axis=0),
+           'mops':np.repeat(target['mops'][:1],12,axis=0),
+           'vol':monthly_volume(dt_path,gastype_ls,2021),
+           'curr_p':np.repeat(target['curr_p'][:1],12,axis=0)}
+
+    res = shapley_subsidy(ref,target,catalog)
+
+    tab = attribution_table(res,price_df['month'].astype(str),gastype_ls)
+    print(tab.groupby(level=['gastype','bound']).sum())
+
+    for b in bound_ls:
+        data = waterfall_series(res,b)
+        print(data)
+        fig = waterfall_plot_subsidy(data,list(data.index),
+                                     title='Change in Subsidy from January Conditions (IDR Trillion)')
+        fig.write_image(dt_path+"output/waterfall_attribution_"+b+".png",scale=5, width=2000, height=1500)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Monte Carlo Simulation of Total Subsidy with Correlated USD/IDR and MOPS Paths
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+from multiprocessing import get_context
+
+import pandas as pd
+import numpy as np
+
+from price_formula import mops_ls, bound_ls, formula_sets, default_regime, evaluate_catalog
+from price_inputs import assign_ref_month, load_daily_panel
+from subsidy_formula import load_price_schedule, curr_price_array
+from subsidy_formula import compute_subsidy_kernel
+from consumption_projection import monthly_volume
+
+dt_path =  "<insert your home directory here>"
+
+series_ls = ['USDIDR'] + mops_ls
+
+n_draws = 10**6
+batch_size = 10**4
+seed = 20220718 # Root seed, each batch draws from its own spawned child seed
+
+# Histogram bins for streaming percentiles (billion IDR)
+hist_edges = np.linspace(0,2*(10**6),20001)
+
+# Budget thresholds (billion IDR): APBN 2022 fuel subsidy and compensation 
+# after revision (see section 5 of compute_total_subsidy.py), IDR 500T and 600T
+budget_ls = [11300 + 71800*(11300/77500) + 18500 + 234000, 500000, 600000]
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+## Cholesky factor and drift of daily log returns, on days all series are observed
+def estimate_log_return(daily):
+    ret = np.log(daily.dropna()).diff().dropna().to_numpy()
+    cov = np.cov(ret,rowvar=False)
+    drift = -0.5*np.diag(cov) # Martingale in levels, i.e. no view on direction
+    return np.linalg.cholesky(cov), drift
+
+"""
+Everything that does not depend on the draw is computed once: the historical
+sum and count by reference month, the simulated business days after the last
+observation of each series, and the one-hot weight of each simulated day in
+its reference month (25th of X-2 to 24th of X-1)
+"""
+
+def build_sim_setup(daily,year=2022):
+
+    hist = assign_ref_month(daily.reset_index().rename(columns={'index':'data_dt'}),'data_dt')
+    hist = hist.loc[hist['ref_year']==year]
+    hist_sum = hist.groupby('ref_month')[series_ls].sum().reindex(range(1,13),fill_value=0)
+    hist_cnt = hist.groupby('ref_month')[series_ls].count().reindex(range(1,13),fill_value=0)
+
+    last_dt = daily.apply(lambda x: x.last_valid_index())
+    last_val = np.array([daily.loc[last_dt[x],x] for x in series_ls])
+
+    sim = pd.DataFrame({'data_dt':pd.bdate_range(last_dt.min()+pd.Timedelta(days=1),
+                                                  str(year)+'-12-31')})
+    sim = assign_ref_month(sim,'data_dt')
+    sim = sim.loc[sim['ref_year']==year].reset_index(drop=True)
+
+    wgt = np.zeros((len(sim),12))
+    wgt[np.arange(len(sim)),sim['ref_month'].astype(int)-1] = 1
+
+    mask = (sim['data_dt'].to_numpy()[:,None] >
+            last_dt.to_numpy().astype('datetime64[ns]')[None,:]).astype('float64')
+
+    return {'hist_sum':hist_sum.to_numpy(),
+            'cnt':hist_cnt.to_numpy() + wgt.T @ mask,
+            'last_val':last_val,'wgt':wgt,'mask':mask}
+
+## Monthly average USD/IDR and MOPS for a batch of simulated daily paths
+def simulate_monthly(setup,chol,drift,n,rng):
+
+    z = rng.standard_normal((n,)+setup['mask'].shape)
+    log_ret = (z @ chol.T + drift) * setup['mask']
+    level = setup['last_val'] * np.exp(np.cumsum(log_ret,axis=1))
+
+    sim_sum = np.einsum('nds,dm->nms',level*setup['mask'],setup['wgt'])
+
+    return (setup['hist_sum'] + sim_sum)/setup['cnt']
+
+#############################################################################
+#   2. Streaming Summary of Simulated Subsidy
+#############################################################################
+
+"""
+Summaries only keep counts and moments, so memory does not grow with the
+number of draws. Percentiles are read off a fixed-bin histogram (resolution
+of one bin), and tail probabilities are exact counts above each budget.
+"""
+
+def init_summary(n_bound=2):
+    return {'n':0,
+            'sum':np.zeros(n_bound),
+            'sum_sq':np.zeros(n_bound),
+            'min':np.full(n_bound,np.inf),
+            'max':np.full(n_bound,-np.inf),
+            'hist':np.zeros((len(hist_edges)+1,n_bound),dtype='int64'),
+            'exceed':np.zeros((len(budget_ls),n_bound),dtype='int64')}
+
+def update_summary(summ,x):
+    summ['n'] += x.shape[0]
+    summ['sum'] += x.sum(axis=0)
+    summ['sum_sq'] += (x**2).sum(axis=0)
+    summ['min'] = np.minimum(summ['min'],x.min(axis=0))
+    summ['max'] = np.maximum(summ['max'],x.max(axis=0))
+    idx = np.searchsorted(hist_edges,x,side='right')
+    for b in range(x.shape[1]):
+        summ['hist'][:,b] += np.bincount(idx[:,b],minlength=len(hist_edges)+1)
+    summ['exceed'] += (x[None,:,:] > np.array(budget_ls)[:,None,None]).sum(axis=1)
+    return summ
+
+def merge_summary(a,b):
+    return {'n':a['n']+b['n'],
+            'sum':a['sum']+b['sum'],
+            'sum_sq':a['sum_sq']+b['sum_sq'],
+            'min':np.minimum(a['min'],b['min']),
+            'max':np.maximum(a['max'],b['max']),
+            'hist':a['hist']+b['hist'],
+            'exceed':a['exceed']+b['exceed']}
+
+## Percentile from histogram, linear within the bin
+def summary_quantile(summ,q):
+    cdf = np.cumsum(summ['hist'],axis=0)/summ['n']
+    res = []
+    for b in range(cdf.shape[1]):
+        i = min(max(np.searchsorted(cdf[:,b],q),1),len(hist_edges)-1)
+        lo, hi = cdf[i-1,b], cdf[i,b]
+        frac = (q-lo)/(hi-lo) if hi > lo else 0
+        res.append(hist_edges[i-1] + frac*(hist_edges[i]-hist_edges[i-1]))
+    return np.clip(res,summ['min'],summ['max'])
+
+def summary_table(summ,q_ls=[0.05,0.25,0.5,0.75,0.95,0.99]):
+    mean = summ['sum']/summ['n']
+    std = np.sqrt(np.maximum(summ['sum_sq']/summ['n'] - mean**2,0))
+    tbl = {'mean':mean,'std':std,'min':summ['min'],'max':summ['max']}
+    tbl.update({'p'+str(int(q*100)):summary_quantile(summ,q) for q in q_ls})
+    tbl.update({'prob_exceed_'+str(round(x)):summ['exceed'][i]/summ['n']
+                for i,x in enumerate(budget_ls)})
+    return pd.DataFrame(tbl,index=['tot_sub_'+x for x in bound_ls])
+
+#############################################################################
+#   3. Simulate Total Subsidy by Batch
+#############################################################################
+
+## One batch of draws, with its own child seed so results do not depend on
+## how batches are spread across worker processes
+def simulate_batch(args):
+
+    setup, chol, drift, catalog, curr_p, vol, child_seed, n = args
+    rng = np.random.default_rng(child_seed)
+
+    avg = simulate_monthly(setup,chol,drift,n,rng)
+    base, retail = evaluate_catalog(avg[...,1:],avg[...,0],catalog)
+
+    tot_sub = compute_subsidy_kernel(retail,curr_p,vol).sum(axis=(1,2))
+
+    return update_summary(init_summary(tot_sub.shape[1]),tot_sub)
+
+def run_simulation(dt_path,n_draws=n_draws,batch_size=batch_size,seed=seed,
+                   regime=default_regime,year=2022,processes=None):
+
+    daily = load_daily_panel(dt_path)
+    chol, drift = estimate_log_return(daily)
+    setup = build_sim_setup(daily,year)
+
+    catalog = formula_sets[regime]
+    gastype_ls = list(catalog['gastype'])
+    month = pd.period_range(str(year)+'-01',str(year)+'-12',freq='M').astype(str)
+    curr_p = curr_price_array(month,gastype_ls,load_price_schedule(dt_path))
+    vol = monthly_volume(dt_path,gastype_ls,year)
+
+    n_batch = -(-n_draws//batch_size)
+    child = np.random.SeedSequence(seed).spawn(n_batch)
+    size = [min(batch_size,n_draws-i*batch_size) for i in range(n_batch)]
+    tasks = [(setup,chol,drift,catalog,curr_p,vol,child[i],size[i])
+             for i in range(n_batch)]
+
+    summ = init_summary()
+    if processes == 1:
+        for x in tasks:
+            summ = merge_summary(summ,simulate_batch(x))
+    else:
+        with get_context("spawn").Pool(processes=processes) as p:
+            for x in p.imap(simulate_batch,tasks):
+                summ = merge_summary(summ,x)
+
+    return summ
+
+#############################################################################
+#   4. Run Simulation
+#############################################################################
+
+if __name__ == '__main__':
+
+    summ = run_simulation(dt_path)
+    res = summary_table(summ)
+
+    print(res.T)
+    res.to_csv(dt_path+'data/subsidy_simulation_summary.csv')
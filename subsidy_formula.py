@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Current Retail Price, Consumption Share and Subsidy Kernel
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+import pandas as pd
+import numpy as np
+
+gas_type = ['biosolar','pertalite','pertamax','turbo','pertadex','dexlite']
+
+#############################################################################
+#   1. Current Retail Price
+#############################################################################
+
+"""
+Current retail prices are an effective-dated schedule (data/retail_price_schedule.csv,
+one row per product and price change; we use Jakarta price for reference). 
+Every (product, effective date) pair is encoded as one sorted integer key, so
+looking up the price in effect for any set of dates and products is a single
+searchsorted, however many price changes the schedule holds.
+"""
+
+key_shift = 2**32 # Product code in the high bits, days since 1970 in the low bits
+
+def load_price_schedule(dt_path):
+    sched = pd.read_csv(dt_path+'data/retail_price_schedule.csv')
+    sched['eff_date'] = pd.to_datetime(sched['eff_date'])
+    return sched
+
+## Sorted lookup index of the schedule for the given product order
+def build_schedule_index(sched,gastype_ls):
+    prod = pd.Categorical(sched['gastype'],categories=gastype_ls).codes.astype('int64')
+    day = sched['eff_date'].to_numpy().astype('datetime64[D]').astype('int64')
+    keep = prod >= 0
+    key = prod[keep]*key_shift + day[keep] + key_shift//2
+    order = np.argsort(key,kind='stable')
+    return {'key':key[order],
+            'price':sched['price'].to_numpy(dtype='float64')[keep][order],
+            'n_prod':len(gastype_ls)}
+
+## Price in effect on each date, (date, product); NaN before the first price
+def lookup_price(index,dates):
+    day = np.asarray(dates,dtype='datetime64[D]').astype('int64')
+    prod = np.arange(index['n_prod'])
+    key = prod[None,:]*key_shift + day[:,None] + key_shift//2
+    pos = np.searchsorted(index['key'],key,side='right') - 1
+    found = (pos >= 0) & (index['key'][np.maximum(pos,0)]//key_shift == prod[None,:])
+    return np.where(found,index['price'][np.maximum(pos,0)],np.nan)
+
+## Monthly current price: price in effect at month end, i.e. a change within
+## the month applies retroactively to the whole month
+def curr_price_array(month,gastype_ls,sched):
+    month_end = pd.PeriodIndex(month,freq='M').end_time.to_numpy()
+    return lookup_price(build_schedule_index(sched,gastype_ls),month_end)
+
+#############################################################################
+#   2. Subsidy Kernel
+#############################################################################
+
+"""
+Unit subsidy is the formula retail price less the current retail price,
+floored at zero, and weighted by volume (stated in billion IDR):
+
+    retail : (..., month, product, bound) formula retail price
+    curr_p : (month, product) current retail price
+    vol    : (product,) or (month, product) volume in litre
+
+With retail and current price both as integer rupiah (price_formula.as_rupiah)
+the difference and the zero floor are exact integer operations.
+"""
+
+def compute_subsidy_kernel(retail,curr_p,vol):
+    unit_sub = np.maximum(retail - curr_p[...,None], 0)
+    return unit_sub * np.asarray(vol)[...,None] / (10**9)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Waterfall Chart of Subsidy Components
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+import plotly.graph_objects as go
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+## Horizontal waterfall, every item of data_ls is relative except the last (total)
+def waterfall_plot_subsidy(data_ls,name_ls,title='Subsidy Breakdown by Type (IDR Trillion)'):
+    
+    fig = go.Figure(go.Waterfall(
+        name = "2018",
+        orientation="h",
+        measure = ["relative"]*(len(data_ls)-1) + ["total"],
+        text = data_ls,
+        y = name_ls,
+        x = data_ls,
+        increasing = {"marker":{"color":'rgb(213,94,0)'}},
+        totals = {"marker":{"color":'rgb(0,114,178)'}},
+        ))
+    
+    fig.update_layout(
+        xaxis=dict(
+            showline=True,
+            showgrid=False,
+            showticklabels=True,
+            linecolor='rgb(204, 204, 204)',
+            linewidth=2,
+            ticks='outside',
+            tickfont=dict(
+                family='Helvetica',
+                size=42,
+                color='rgb(82, 82, 82)',
+            ),
+        ),
+        yaxis=dict(
+            showgrid=False,
+            zeroline=False,
+            showline=True,
+            showticklabels=True,
+            linecolor='rgb(204, 204, 204)',
+            linewidth=2,
+            ticks='outside',
+            tickfont=dict(
+                family='Helvetica',
+                size=42,
+                color='rgb(82, 82, 82)',
+            ),
+        ),
+        autosize=True,
+        margin=dict(
+            autoexpand=False,
+            l=100,
+            r=20,
+            t=110,
+        ),
+        showlegend=False,
+        font=dict(family='Helvetica',
+                  size=36),
+        plot_bgcolor='white',
+    )
+    
+    # Adding labels
+    annotations = []
+    
+    # Title
+    annotations.append(dict(xref='paper', yref='paper', x=0.01, y=1,
+                                  xanchor='left', yanchor='bottom',
+                                  text=title,
+                                  font=dict(family='Helvetica',
+                                            size=60,
+                                            color='rgb(37,37,37)'),
+                                  showarrow=False))
+    
+    fig.update_layout(annotations=annotations,margin=dict(l=300, r=100, t=150, b=150))
+    
+    return fig
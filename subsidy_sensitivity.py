@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Sensitivity of Total Subsidy to Monthly USD/IDR, MOPS and Volume
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+import pandas as pd
+import numpy as np
+
+from price_formula import round_up, subs_biogasoil, vat, fuel_tax, mops_ls, bound_ls
+from price_formula import bbl_to_ltr, margin, formula_sets, default_regime, evaluate_catalog
+from price_inputs import load_price_panel
+from subsidy_formula import load_price_schedule, curr_price_array
+from subsidy_formula import compute_subsidy_kernel
+from consumption_projection import monthly_volume
+
+dt_path =  "<insert your home directory here>"
+
+eoy_er = 15000 # End-of-year exchange rate projection
+er_step = 100 # Finite difference step, IDR per USD
+mops_step = 1 # Finite difference step, USD per barrel
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+"""
+The base price is linear in MOPS x USD/IDR, so away from the 50-rupiah ceil
+and the zero floor of the unit subsidy the total subsidy has closed-form
+partial derivatives. For product p using MOPS series s(p), in month m:
+
+    d sub / d base = vol * (1+vat) * (1+fuel_tax) / 10^9, if retail > current
+    d base / d er  = mops_s(p) * mult * (1+dist) * margin / bbl_to_ltr
+    d base / d mops_s(p) = er * mult * (1+dist) * margin / bbl_to_ltr
+    d sub / d vol  = unit subsidy / 10^9
+
+Each monthly input only moves the subsidy of its own month, so the step-aware
+finite differences (which do see the ceil steps) for all months are obtained
+by shifting every month at once: one scenario for ER and one per MOPS series,
+all stacked into a single evaluation of the price kernel.
+"""
+
+def subsidy_sensitivity(mops,er,curr_p,vol,catalog,er_step=er_step,mops_step=mops_step,
+                        subsidy=subs_biogasoil,rounding=round_up,vat=vat,fuel_tax=fuel_tax):
+
+    mops = np.asarray(mops,dtype='float64')
+    er = np.asarray(er,dtype='float64')
+    vol = np.broadcast_to(vol,curr_p.shape)
+    n_mo, n_ser = mops.shape
+
+    # Base point, ER shifted, and each MOPS series shifted, as one scenario stack
+    shift = np.zeros((2+n_ser,n_mo,n_ser))
+    shift[2:] = np.eye(n_ser)[:,None,:] * mops_step
+    er_s = np.tile(er,(2+n_ser,1))
+    er_s[1] += er_step
+
+    base, retail = evaluate_catalog(mops+shift,er_s,catalog,subsidy,rounding,vat,fuel_tax)
+    sub = compute_subsidy_kernel(retail,curr_p,vol)   # (scenario, month, product, bound)
+    sub_mo = sub.sum(axis=2)
+
+    # Analytic partial derivatives
+    col = (catalog['mops'][:,None] == np.array(mops_ls)).argmax(axis=-1)
+    active = retail[0] > curr_p[...,None]
+    slope = (catalog['mult']*(1+catalog['dist'])/bbl_to_ltr)[:,None] * np.array([margin,1])
+    g = vol[...,None]/(10**9) * active * (1+vat)*(1+fuel_tax) * slope
+
+    d_er = (g * mops[:,col][...,None]).sum(axis=1)
+    d_mops = np.zeros((n_mo,n_ser,len(bound_ls)))
+    np.add.at(d_mops,(slice(None),col),g*er[:,None,None])
+
+    # Distance (in IDR per USD) the ER can rise before each retail price steps up
+    pre = (base[0]*(1+vat)-catalog['fixed_sub'][:,None]*subsidy)*(1+fuel_tax)/rounding
+    gap = (np.ceil(pre)-pre)*rounding/((1+vat)*(1+fuel_tax))
+    der_base = mops[:,col][...,None] * slope
+
+    return {'d_er':d_er,
+            'd_mops':d_mops,
+            'd_vol':np.maximum(retail[0]-curr_p[...,None],0)/(10**9),
+            'fd_er':sub_mo[1]-sub_mo[0],
+            'fd_mops':np.moveaxis(sub_mo[2:]-sub_mo[0],0,1),
+            'er_to_step':gap/der_base}
+
+## Annual sensitivity table, per er_step and per mops_step
+def sensitivity_table(sens,er_step=er_step,mops_step=mops_step):
+    idx = ['USDIDR +'+str(er_step)] + [x+' +'+str(mops_step) for x in mops_ls]
+    cols = ['tot_sub_'+x for x in bound_ls]
+    analytic = np.vstack([sens['d_er'].sum(axis=0)*er_step,
+                          sens['d_mops'].sum(axis=0)*mops_step])
+    step = np.vstack([sens['fd_er'].sum(axis=0),sens['fd_mops'].sum(axis=0)])
+    return pd.concat({'analytic':pd.DataFrame(analytic,index=idx,columns=cols),
+                      'finite_diff':pd.DataFrame(step,index=idx,columns=cols)},axis=1)
+
+#############################################################################
+#   2. Compute Sensitivity for the Baseline Scenario
+#############################################################################
+
+if __name__ == '__main__':
+
+    price_df = load_price_panel(dt_path)
+    price_df.loc[price_df['USDIDR'].isnull(),'USDIDR'] = eoy_er
+
+    catalog = formula_sets[default_regime]
+    gastype_ls = list(catalog['gastype'])
+    curr_p = curr_price_array(price_df['month'],gastype_ls,
+                              load_price_schedule(dt_path))
+    vol = monthly_volume(dt_path,gastype_ls)
+
+    sens = subsidy_sensitivity(price_df[mops_ls].to_numpy(),price_df['USDIDR'].to_numpy(),
+                               curr_p,vol,catalog)
+
+    # Change in annual subsidy (billion IDR)
+    print(sensitivity_table(sens))
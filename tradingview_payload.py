@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Description: Parse TradingView Chart Data Payload into Daily OHLC Series
+Author: @sihir_sains
+"""
+
+#############################################################################
+#   0. Load Necessary Library and Set Up Necessary Variables
+#############################################################################
+
+import json
+import re
+
+import pandas as pd
+
+out_path =  "<insert your home directory here>"
+
+ohlc_ls = ['open','high','low','close']
+frame_head = re.compile(r'~m~(\d+)~m~')
+
+#############################################################################
+#   1. Define Sub-Functions
+#############################################################################
+
+"""
+The chart page receives its bars over a websocket. Every websocket frame
+holds one or more messages, each prefixed by ~m~<length>~m~; a message is
+either a heartbeat (~h~<n>) or JSON. The main series comes in
+'timescale_update' messages (the full history loaded with the chart) and
+'du' messages (updates of the latest bar), both as
+
+    {"m": ..., "p": [session, {"sds_1": {"s": [{"i": .., "v": [time, o, h, l, c, vol]}, ...]}}]}
+
+with time in seconds since 1970 (UTC). Capturing the frames once per symbol
+gives the whole series, without reading the chart legend bar by bar.
+
+data/fixtures/tradingview_payload_mogas_92.txt is synthetic: it was written
+by hand in this format from ten mogas_92 closes of platts_price.csv (open,
+high and low are made up around them), not captured from the site. It tests
+the parser only; check the format against a real capture when the site
+changes.
+"""
+
+## Split a websocket frame into its messages
+def split_frames(txt):
+    msgs, i = [], 0
+    while True:
+        m = frame_head.match(txt,i)
+        if m is None:
+            return msgs
+        n = int(m.group(1))
+        msgs.append(txt[m.end():m.end()+n])
+        i = m.end() + n
+
+## OHLC bars of one series from a list of websocket frames, latest value of each bar kept
+def parse_series_payload(frames,series_id='sds_1'):
+
+    bars = {}
+    for txt in frames:
+        for msg in split_frames(txt.strip()):
+            if not msg.startswith('{'):
+                continue
+            js = json.loads(msg)
+            if js.get('m') not in ['timescale_update','du']:
+                continue
+            sds = js['p'][1].get(series_id,{})
+            for bar in sds.get('s',[]):
+                bars[bar['v'][0]] = bar['v'][1:5]
+
+    ohlc = pd.DataFrame.from_dict(bars,orient='index',columns=ohlc_ls).sort_index()
+    ohlc.index = pd.to_datetime(ohlc.index,unit='s').date
+    ohlc.index.name = 'data_dt'
+    return ohlc
+
+## Saved payload, one websocket frame per line
+def read_payload_fixture(fn):
+    with open(fn,encoding='utf-8') as f:
+        return f.read().splitlines()
+
+#############################################################################
+#   2. Parse the Saved Fixture
+#############################################################################
+
+if __name__ == '__main__':
+
+    # Synthetic fixture, see above
+    ohlc = parse_series_payload(read_payload_fixture(
+        out_path+'data/fixtures/tradingview_payload_mogas_92.txt'))
+    print(ohlc)
@@ -18,6 +18,7 @@ dt_path =  "<insert your home directory here>"
 os.chdir(dt_path)
 
 import config
+from result_store import read_results
 
 """
 Notes: The API Key for FRED is stored in private config.py file. 
@@ -182,10 +183,12 @@ monthly_us['diesel_idr'] = convert_metric_idr(monthly_us,'diesel','USDIDR')
 #   4. Check with Monthly Data
 #############################################################################
 
-retail_price = pd.read_csv(dt_path+'data/retail_price.csv')
-retail_price['month'] = pd.to_datetime(retail_price['month']).dt.to_period('M')
-
-retail_price = retail_price.set_index(['month'],drop=True)
+retail_price = read_results(dt_path,'price',columns=['month','gastype','bound','retail_price'],
+                            filters=[('scenario','=','baseline'),
+                                     ('gastype','in',['pertamax','pertadex'])])
+retail_price = retail_price.pivot_table(index='month',columns=['gastype','bound'],
+                                        values='retail_price',observed=True)
+retail_price.columns = [x+'_'+b for x,b in retail_price.columns]
 
 merged = pd.concat([monthly_us,retail_price],axis=1).reset_index()
 merged['month'] = merged['month'].dt.to_timestamp()